@@ -1,30 +1,41 @@
+import os
+import sys
 import time
 import random
 import logging
 from urllib.parse import urlparse, unquote
 import requests
-from bs4 import BeautifulSoup
 import json
 import csv
+from serp_cache import SerpCache
+from serp_parse import EXTRACTORS, default_extractor
 
-logging.basicConfig(level=logging.DEBUG)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from urlcanon import UrlCanonicalizer
+
+# LOGLEVEL=DEBUG also logs response headers, page snippets and every link
+logging.basicConfig(level=os.environ.get('LOGLEVEL', 'INFO').upper())
+
+# Scheme-less "host/path?query" keys, memoized: the same Google and engine
+# URLs are normalized over and over
+URLS = UrlCanonicalizer(include_scheme=False)
 
 def normalize_url(url):
     if not url:
         return ""
-    parsed = urlparse(url)
-    netloc = parsed.netloc
-    if netloc.startswith('www.'):
-        netloc = netloc[4:]
-    path = parsed.path.rstrip('/')
-    normalized = f"{netloc}{path}"
-    if parsed.query:
-        normalized += f"?{parsed.query}"
-    return normalized
+    return URLS.canonicalize(url)
 
 class SearchEngine:
-    def __init__(self, base_url):
+    def __init__(self, base_url, delay=(10, 40), cache=None, offline=False, extractor=None):
+        # delay is the (min, max) seconds slept before each search; None when
+        # the caller paces requests itself. With a SerpCache, cached pages are
+        # reused without a request, and offline=True never touches the network.
         self.base_url = base_url
+        self.delay = delay
+        self.cache = cache
+        self.offline = offline
+        # Result-page parser, see serp_parse.EXTRACTORS
+        self.extract = EXTRACTORS[extractor or default_extractor()]
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -37,63 +48,92 @@ class SearchEngine:
         })
 
     def search(self, query):
-        delay = random.uniform(10, 40)
-        logging.info(f"Sleeping for {delay:.2f} seconds before searching for '{query}'")
-        time.sleep(delay)
+        content = self.lookup(query)
+        if content is None:
+            if self.offline:
+                logging.warning(f"'{query}' is not in the SERP cache, skipping it in offline mode")
+                return []
+
+            if self.delay:
+                delay = random.uniform(*self.delay)
+                logging.info(f"Sleeping for {delay:.2f} seconds before searching for '{query}'")
+                time.sleep(delay)
+
+            try:
+                content = self.fetch(query)
+            except requests.RequestException as e:
+                logging.error(f"Error fetching search results: {e}")
+                return []
+            results = self.parse(content)
+            self.store(query, content, results)
+        else:
+            results = self.parse(content)
+        if not results:
+            logging.warning(f"No results found with any selector. Dumping full HTML to 'debug_output.html'")
+            with open('debug_output.html', 'w', encoding='utf-8') as f:
+                f.write(content)
+        return results
 
-        url = self.base_url + '+'.join(query.split())
-        logging.info(f"Sending request to {url}")
+    def query_url(self, query):
+        return self.base_url + '+'.join(query.split())
 
-        try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            logging.error(f"Error fetching search results: {e}")
-            return []
+    def fetch(self, query):
+        # Raw result page HTML; raises requests.RequestException on failure.
+        # Not cached here: the caller parses the page and then calls store().
+        url = self.query_url(query)
+        logging.info(f"Sending request to {url}")
 
-        logging.debug(f"Response status code: {response.status_code}")
-        logging.debug(f"Response headers: {response.headers}")
+        response = self.session.get(url, timeout=30)
+        response.raise_for_status()
 
         content = response.text
-        logging.debug(f"Decoded content (first 1000 characters): {content[:1000]}")
-
-        soup = BeautifulSoup(content, "html.parser")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"Response status code: {response.status_code}")
+            logging.debug(f"Response headers: {response.headers}")
+            logging.debug(f"Decoded content (first 1000 characters): {content[:1000]}")
+        return content
+
+    def store(self, query, content, results):
+        # Captcha and anomaly pages come back as 200s with no results; caching
+        # one would replay it for the whole TTL
+        if self.cache and results:
+            self.cache.put(self.base_url, query, content, self.query_url(query))
+
+    def lookup(self, query):
+        # Cached page HTML, or None; offline replay ignores the TTL
+        if not self.cache:
+            return None
+        content = self.cache.get(self.base_url, query, ttl=None if self.offline else -1)
+        if content is not None:
+            logging.info(f"Using cached results for '{query}'")
+        return content
+
+    def parse(self, content):
+        # Checked once per page rather than formatting a message per link
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        raw_results = self.extract(content)
+        if debug:
+            logging.debug(f"Found {len(raw_results)} raw results")
 
         results = []
-        selectors = [
-            "div.result__body a.result__a",
-            "div.results a.result__a",
-            "div.links_main a.result__a",
-            "div.results_links a.large",
-            "article.result h2 a",
-            "div.result__title a"
-        ]
-
-        for selector in selectors:
-            raw_results = soup.select(selector)
-            logging.info(f"Found {len(raw_results)} raw results with selector '{selector}'")
-
-            for result in raw_results:
-                link = result.get('href')
-                if link:
-                    if link.startswith('/'):
-                        link = 'https://duckduckgo.com' + link
-                    parsed = urlparse(link)
-                    if parsed.netloc == 'duckduckgo.com' and parsed.path == '/l/':
-                        actual_url = parsed.query.split('uddg=')[-1].split('&')[0]
-                        link = unquote(actual_url)
-
-                normalized_url = normalize_url(link)
+        seen = set()
+        for link in raw_results:
+            if link:
+                if link.startswith('/'):
+                    link = 'https://duckduckgo.com' + link
+                parsed = urlparse(link)
+                if parsed.netloc == 'duckduckgo.com' and parsed.path == '/l/':
+                    actual_url = parsed.query.split('uddg=')[-1].split('&')[0]
+                    link = unquote(actual_url)
+
+            normalized_url = normalize_url(link)
+            if debug:
                 logging.debug(f"Processed link: {normalized_url}")
-                if normalized_url and normalized_url not in results:
-                    results.append(normalized_url)
-                    if len(results) == 10:
-                        return results
-
-        if not results:
-            logging.warning(f"No results found with any selector. Dumping full HTML to 'debug_output.html'")
-            with open('debug_output.html', 'w', encoding='utf-8') as f:
-                f.write(content)
+            if normalized_url and normalized_url not in seen:
+                seen.add(normalized_url)
+                results.append(normalized_url)
+                if len(results) == 10:
+                    break
 
         logging.info(f"Processed {len(results)} unique results")
         return results
@@ -133,8 +173,20 @@ def calculate_overlap_and_spearman(engine_results, google_results):
 
     return overlap_percent, rho
 
+def write_stats(stats, path="hw1.csv"):
+    with open(path, "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Query", "Number of Overlapping Results", "Percent Overlap", "Spearman Coefficient"])
+        for stat in stats:
+            writer.writerow(stat)
+
+        # Calculate and write averages
+        avg_overlap = sum(s[2] for s in stats) / len(stats)
+        avg_rho = sum(s[3] for s in stats) / len(stats)
+        writer.writerow(["Averages", avg_overlap/10, avg_overlap, avg_rho])
+
 def main():
-    engine = SearchEngine("https://html.duckduckgo.com/html/?q=")
+    engine = SearchEngine("https://html.duckduckgo.com/html/?q=", cache=SerpCache("serp_cache"))
 
     queries = load_queries("100QueriesSet4.txt")  # Update with your assigned query set
     google_results = load_google_results("Google_Result4.json")  # Update with your assigned Google results file
@@ -155,16 +207,7 @@ def main():
         json.dump(results, f, indent=2)
 
     # Save statistics to CSV file
-    with open("hw1.csv", "w", newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Query", "Number of Overlapping Results", "Percent Overlap", "Spearman Coefficient"])
-        for stat in stats:
-            writer.writerow(stat)
-
-        # Calculate and write averages
-        avg_overlap = sum(s[2] for s in stats) / len(stats)
-        avg_rho = sum(s[3] for s in stats) / len(stats)
-        writer.writerow(["Averages", avg_overlap/10, avg_overlap, avg_rho])
+    write_stats(stats, "hw1.csv")
 
     logging.info("Results saved to hw1.json and hw1.csv")
 
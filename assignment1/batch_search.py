@@ -0,0 +1,211 @@
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from queue import Queue
+
+import requests
+
+from assignment1 import (SearchEngine, load_queries, load_google_results,
+                         calculate_overlap_and_spearman, write_stats)
+from serp_cache import SerpCache
+from serp_parse import EXTRACTORS
+
+
+# Global request budget shared by every fetch thread: `rate` requests per
+# minute on average, at most `burst` back to back.
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        # With no rate or no burst, acquire() would never hand out a token
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"TokenBucket needs rate > 0 and burst >= 1, got rate={rate}, burst={burst}")
+        self.rate = rate / 60.0
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Runs every query through the search engine under one request budget. Fetch
+# threads only wait for tokens and download; the main thread parses, scores
+# and appends each finished query to a JSONL progress file while they wait.
+# Failed or empty result pages are retried with exponential backoff; one that
+# runs out of retries is recorded with its error, and a rerun skips every
+# query in the progress file except those.
+class BatchRunner:
+    def __init__(self, base_url, rate=6, burst=1, workers=4, max_retries=3, backoff=30.0,
+                 jitter=0.5, progress_path="hw1.progress.jsonl", cache=None, offline=False,
+                 extractor=None):
+        self.base_url = base_url
+        self.extractor = extractor
+        self.cache = cache
+        self.offline = offline
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # Requests spaced exactly 60/rate apart look more robotic than a person
+        self.jitter = jitter
+        self.progress_path = progress_path
+        self.todo = Queue()
+        self.fetched = Queue()
+
+    def load_progress(self):
+        done = {}
+        if self.progress_path and os.path.exists(self.progress_path):
+            with open(self.progress_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; that query runs again
+                        continue
+                    if record.get("error"):
+                        # Gave up after its retries last time; try it again
+                        done.pop(record["query"], None)
+                        continue
+                    done[record["query"]] = record
+        return done
+
+    def fetch_worker(self):
+        engine = SearchEngine(self.base_url, delay=None, cache=self.cache, offline=self.offline)
+        while True:
+            item = self.todo.get()
+            if item is None:
+                return
+            query, attempt = item
+            # A cached page costs no request; retries always go to the network
+            content = engine.lookup(query) if attempt == 0 else None
+            if content is not None or self.offline:
+                error = None if content is not None else "not in the SERP cache"
+                self.fetched.put((query, attempt, content, error, False))
+                continue
+            self.bucket.acquire()
+            if self.jitter:
+                time.sleep(random.uniform(0, self.jitter / self.bucket.rate))
+            try:
+                content, error = engine.fetch(query), None
+            except requests.RequestException as e:
+                content, error = None, e
+            self.fetched.put((query, attempt, content, error, content is not None))
+
+    def retry(self, query, attempt):
+        delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        logging.info(f"Retrying '{query}' in {delay:.0f}s (attempt {attempt + 2})")
+        timer = threading.Timer(delay, self.todo.put, args=((query, attempt + 1),))
+        timer.daemon = True
+        timer.start()
+
+    def run(self, queries, google_results):
+        # Returns {query: results} and the hw1.csv rows, both in query order
+        done = self.load_progress()
+        pending = [q for q in dict.fromkeys(queries) if q not in done]
+        logging.info(f"{len(done)} queries already done, {len(pending)} to run")
+
+        threads = [threading.Thread(target=self.fetch_worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for query in pending:
+            self.todo.put((query, 0))
+
+        # Parses every page once, then caches the fresh ones that had results
+        parser = SearchEngine(self.base_url, delay=None, cache=self.cache, extractor=self.extractor)
+        progress = open(self.progress_path, 'a', encoding='utf-8') if self.progress_path else None
+        try:
+            remaining = len(pending)
+            while remaining:
+                query, attempt, content, error, fresh = self.fetched.get()
+                results = parser.parse(content) if content is not None else []
+                if fresh:
+                    parser.store(query, content, results)
+                if not results and attempt < self.max_retries and not self.offline:
+                    logging.warning(f"No results for '{query}': {error or 'empty result page'}")
+                    self.retry(query, attempt)
+                    continue
+
+                overlap_percent, rho = calculate_overlap_and_spearman(results, google_results[query])
+                record = {"query": query, "results": results, "overlap": overlap_percent, "rho": rho}
+                if not results:
+                    record["error"] = str(error or "empty result page")
+                if progress:
+                    progress.write(json.dumps(record) + "\n")
+                    progress.flush()
+                done[query] = record
+                remaining -= 1
+                logging.info(f"Finished '{query}' ({len(done)}/{len(done) + remaining})")
+        finally:
+            if progress:
+                progress.close()
+
+        for _ in threads:
+            self.todo.put(None)
+
+        results = {}
+        stats = []
+        for query in queries:
+            record = done[query]
+            results[query] = record["results"]
+            stats.append((query, int(record["overlap"] / 10), record["overlap"], record["rho"]))
+        return results, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all queries under a shared rate limit")
+    parser.add_argument('--queries', default="100QueriesSet4.txt")
+    parser.add_argument('--google', default="Google_Result4.json")
+    parser.add_argument('--base-url', default="https://html.duckduckgo.com/html/?q=")
+    parser.add_argument('--rate', type=float, default=6, help="requests per minute across all workers")
+    parser.add_argument('--burst', type=int, default=1, help="requests allowed back to back")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--retries', type=int, default=3, help="retries for failed or empty result pages")
+    parser.add_argument('--backoff', type=float, default=30.0, help="seconds before the first retry")
+    parser.add_argument('--progress', default="hw1.progress.jsonl",
+                        help="finished queries, appended as they complete; reruns resume from it")
+    parser.add_argument('--cache', default="serp_cache", help="directory of cached raw result pages")
+    parser.add_argument('--ttl', type=float, default=7 * 24, help="hours before a cached page is refetched")
+    parser.add_argument('--offline', action='store_true',
+                        help="replay cached pages only, with no network requests")
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--extractor', choices=list(EXTRACTORS), help="result-page parser (default: fastest installed)")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    google_results = load_google_results(args.google)
+
+    if args.rate <= 0:
+        parser.error("--rate must be greater than 0")
+    if args.burst < 1:
+        parser.error("--burst must be at least 1")
+    if args.offline and args.no_cache:
+        parser.error("--offline replays the cache and cannot be combined with --no-cache")
+    cache = None if args.no_cache else SerpCache(args.cache, ttl=args.ttl * 3600)
+    runner = BatchRunner(args.base_url, rate=args.rate, burst=args.burst, workers=args.workers,
+                         max_retries=args.retries, backoff=args.backoff,
+                         # A replay takes seconds, so it always starts from scratch
+                         progress_path=None if args.offline else args.progress,
+                         cache=cache, offline=args.offline, extractor=args.extractor)
+    results, stats = runner.run(queries, google_results)
+
+    with open("hw1.json", "w") as f:
+        json.dump(results, f, indent=2)
+    write_stats(stats, "hw1.csv")
+    logging.info("Results saved to hw1.json and hw1.csv")
+
+
+if __name__ == "__main__":
+    main()
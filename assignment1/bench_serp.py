@@ -0,0 +1,69 @@
+import argparse
+import glob
+import gzip
+import logging
+import os
+import time
+
+from assignment1 import SearchEngine
+from serp_parse import EXTRACTORS
+
+
+# Compares the result-page extractors on stored SERPs: time per page and
+# whether each one yields exactly the same links and top-10 list as the
+# BeautifulSoup path.
+#
+#   python bench_serp.py                       # every page in serp_cache/
+#   python bench_serp.py --pages saved_serps   # or a directory of *.html files
+
+
+def load_pages(path):
+    pages = []
+    for name in sorted(glob.glob(os.path.join(path, '**', '*.html.gz'), recursive=True)):
+        with gzip.open(name, 'rt', encoding='utf-8') as f:
+            pages.append(f.read())
+    for name in sorted(glob.glob(os.path.join(path, '*.html'))):
+        with open(name, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def benchmark(pages, extractors, repeat):
+    total_bytes = sum(len(page.encode('utf-8')) for page in pages)
+    reference = [SearchEngine("", extractor='bs4').parse(page) for page in pages]
+    # parse() drops repeated links, so the raw hrefs are compared as well
+    raw_reference = [EXTRACTORS['bs4'](page) for page in pages]
+    print(f"{len(pages)} pages, {total_bytes / 2 ** 20:.1f} MB")
+    print(f"{'extractor':<11} {'ms/page':>9} {'speedup':>8}  links and top 10")
+
+    baseline = None
+    for name in extractors:
+        engine = SearchEngine("", extractor=name)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = [engine.parse(page) for page in pages]
+            best = min(best, time.perf_counter() - start)
+        if baseline is None:
+            baseline = best
+        raw = [EXTRACTORS[name](page) for page in pages]
+        mismatches = sum(1 for found, expected, links, expected_links in zip(results, reference, raw, raw_reference)
+                         if found != expected or links != expected_links)
+        same = "same as bs4" if not mismatches else f"{mismatches} pages differ from bs4"
+        print(f"{name:<11} {1000 * best / len(pages):>9.2f} {baseline / best:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', default='serp_cache', help="SERP cache or directory of saved pages")
+    parser.add_argument('--extractors', nargs='+', default=list(EXTRACTORS), choices=list(EXTRACTORS))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Timing the parsers, not the per-page log lines
+    logging.getLogger().setLevel(logging.WARNING)
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"No stored pages in {args.pages}; run batch_search.py with a cache first")
+    else:
+        benchmark(pages, args.extractors, args.repeat)
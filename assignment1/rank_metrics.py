@@ -0,0 +1,184 @@
+import argparse
+import csv
+import json
+import time
+
+import numpy as np
+
+from assignment1 import normalize_url, calculate_overlap_and_spearman, write_stats
+
+
+METRICS = ["overlap", "overlap_percent", "spearman", "kendall", "rbo", "ndcg"]
+
+
+# Scores every query at once. URLs are normalized once each and interned to
+# integer IDs, so a result set becomes two (queries x depth) int arrays padded
+# with -1, and each metric is a handful of array operations over all queries.
+# Depths and gains come from each query's own list lengths, so a query scores
+# the same whatever else is in the batch.
+
+def encode(engine_lists, google_lists):
+    # Returns (engine IDs, Google IDs, engine list lengths, Google list lengths)
+    ids = {}
+    canonical = {}
+
+    def intern(urls):
+        row = []
+        for url in urls:
+            key = canonical.get(url)
+            if key is None:
+                key = canonical[url] = normalize_url(url)
+            row.append(ids.setdefault(key, len(ids)))
+        return row
+
+    def pad(rows):
+        depth = max((len(row) for row in rows), default=0) or 1
+        array = np.full((len(rows), depth), -1, dtype=np.int64)
+        for i, row in enumerate(rows):
+            array[i, :len(row)] = row
+        return array
+
+    engine = pad([intern(urls) for urls in engine_lists])
+    google = pad([intern(urls) for urls in google_lists])
+    engine_lengths = np.array([len(urls) for urls in engine_lists], dtype=np.int64)
+    lengths = np.array([len(urls) for urls in google_lists], dtype=np.int64)
+    return engine, google, engine_lengths, lengths
+
+
+def first_occurrences(ids):
+    # True where a position holds a URL not already seen earlier in its list
+    depth = ids.shape[1]
+    earlier = np.tril(np.ones((depth, depth), dtype=bool), -1)
+    repeated = ((ids[:, :, None] == ids[:, None, :]) & earlier).any(axis=2)
+    return (ids >= 0) & ~repeated
+
+
+def score(engine_lists, google_lists, p=0.9):
+    # Returns {metric: array with one value per query}
+    engine, google, engine_lengths, lengths = encode(engine_lists, google_lists)
+    engine_depth, google_depth = engine.shape[1], google.shape[1]
+    valid_engine = first_occurrences(engine)
+    valid_google = first_occurrences(google)
+
+    # match[q, i, j]: engine rank i and Google rank j hold the same URL. Both
+    # sides are deduplicated first, so each row and column has at most one hit.
+    match = (engine[:, :, None] == google[:, None, :]) & valid_engine[:, :, None] & valid_google[:, None, :]
+    n = match.sum(axis=(1, 2))
+    engine_rank = np.arange(engine_depth)[None, :, None]
+    google_rank = np.arange(google_depth)[None, None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overlap_percent = np.where(lengths > 0, n / lengths * 100, 0.0)
+
+        # Same definition as calculate_overlap_and_spearman: ranks are positions
+        # in the full lists, and one shared URL scores 1 or -1
+        d_squared = (match * (engine_rank - google_rank) ** 2).sum(axis=(1, 2))
+        rho = 1 - 6 * d_squared / (n * (n ** 2 - 1))
+        spearman = np.where(n >= 2, rho, np.where(n == 1, np.where(d_squared == 0, 1.0, -1.0), 0.0))
+
+        # Kendall tau-a over the shared URLs: do pairs keep their relative order?
+        # Undefined below two shared URLs, scored 0 there.
+        google_of = np.where(match.any(axis=2), match.argmax(axis=2), -1)
+        matched = google_of >= 0
+        later = np.triu(np.ones((engine_depth, engine_depth), dtype=bool), 1)
+        pairs = matched[:, :, None] & matched[:, None, :] & later
+        concordant = (pairs & (google_of[:, :, None] < google_of[:, None, :])).sum(axis=(1, 2))
+        discordant = (pairs & (google_of[:, :, None] > google_of[:, None, :])).sum(axis=(1, 2))
+        kendall = np.where(n >= 2, (concordant - discordant) / (n * (n - 1) / 2), 0.0)
+
+        # Extrapolated rank-biased overlap, RBO_ext (Webber et al. 2010, eq. 32),
+        # for a shorter list of length s and a longer one of length l:
+        #   (1-p)/p * (sum_{d<=l} X_d/d p^d + sum_{s<d<=l} X_s (d-s)/(s d) p^d)
+        #     + ((X_l - X_s)/l + X_s/s) p^l
+        # where X_d is the overlap at depth d, the shorter list cut at s
+        depth = max(engine_depth, google_depth)
+        # Lengths floored at 1 only to keep the indexing valid; empty lists score 0
+        short = np.maximum(np.minimum(engine_lengths, lengths), 1)
+        long = np.maximum(np.maximum(engine_lengths, lengths), 1)
+        deepest = np.maximum(engine_rank, google_rank)
+        new_at = np.stack([(match & (deepest == d)).sum(axis=(1, 2)) for d in range(depth)], axis=1)
+        overlap_at = np.cumsum(new_at, axis=1)
+        rows = np.arange(len(short))
+        x_s, x_l = overlap_at[rows, short - 1], overlap_at[rows, long - 1]
+        d = np.arange(1, depth + 1)
+        weights = p ** d
+        s, l = short[:, None], long[:, None]
+        seen = (overlap_at / d * weights * (d <= l)).sum(axis=1)
+        extrapolated = (x_s[:, None] * (d - s) / (s * d) * weights * ((d > s) & (d <= l))).sum(axis=1)
+        rbo = (1 - p) / p * (seen + extrapolated) + ((x_l - x_s) / long + x_s / short) * p ** long
+        rbo = np.where((engine_lengths > 0) & (lengths > 0), rbo, 0.0)
+
+        # NDCG of the engine's list, taking Google's order as graded relevance:
+        # Google's first result is worth its list length, its last 1. The ideal
+        # list is Google's own, cut at the engine list's length.
+        discount = 1 / np.log2(np.arange(engine_depth) + 2)
+        gain = np.where(matched, lengths[:, None] - google_of, 0)
+        dcg = (gain * discount).sum(axis=1)
+        ideal = np.where(valid_google, lengths[:, None] - np.arange(google_depth), 0)
+        ideal = np.sort(ideal, axis=1)[:, ::-1][:, :engine_depth]
+        within = np.arange(ideal.shape[1]) < engine_lengths[:, None]
+        idcg = (ideal * discount[:ideal.shape[1]] * within).sum(axis=1)
+        ndcg = np.where(idcg > 0, dcg / idcg, 0.0)
+
+    return {"overlap": n, "overlap_percent": overlap_percent, "spearman": spearman,
+            "kendall": kendall, "rbo": rbo, "ndcg": ndcg}
+
+
+def hw1_stats(queries, metrics):
+    # Rows for write_stats, formatted exactly like the per-query path
+    # (integer coefficients for the 0 and 1 shared URL cases)
+    stats = []
+    for i, query in enumerate(queries):
+        overlap_percent = float(metrics["overlap_percent"][i])
+        rho = float(metrics["spearman"][i])
+        if metrics["overlap"][i] < 2:
+            rho = int(rho)
+        stats.append((query, int(overlap_percent / 10), overlap_percent, rho))
+    return stats
+
+
+def write_metrics(queries, metrics, path):
+    with open(path, "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Query"] + METRICS)
+        for i, query in enumerate(queries):
+            writer.writerow([query] + [metrics[name][i] for name in METRICS])
+        writer.writerow(["Averages"] + [metrics[name].mean() for name in METRICS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score engine results against Google for every query at once")
+    parser.add_argument('--results', default="hw1.json", help="engine results, {query: [urls]}")
+    parser.add_argument('--google', default="Google_Result4.json")
+    parser.add_argument('--csv', default="hw1.csv", help="overlap and Spearman per query, as in the assignment")
+    parser.add_argument('--metrics', default="hw1_metrics.csv", help="every metric per query")
+    parser.add_argument('--rbo-p', type=float, default=0.9, help="RBO persistence")
+    parser.add_argument('--compare', action='store_true',
+                        help="also time the per-query calculate_overlap_and_spearman loop")
+    args = parser.parse_args()
+
+    with open(args.results) as f:
+        results = json.load(f)
+    with open(args.google) as f:
+        google_results = json.load(f)
+    queries = list(results)
+
+    start = time.perf_counter()
+    metrics = score([results[q] for q in queries], [google_results[q] for q in queries], p=args.rbo_p)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {len(queries)} queries in {elapsed:.3f}s")
+
+    if args.compare:
+        start = time.perf_counter()
+        for query in queries:
+            calculate_overlap_and_spearman(results[query], google_results[query])
+        print(f"Per-query loop (overlap and Spearman only): {time.perf_counter() - start:.3f}s")
+
+    write_stats(hw1_stats(queries, metrics), args.csv)
+    write_metrics(queries, metrics, args.metrics)
+    for name in METRICS:
+        print(f"  {name:<16} {metrics[name].mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+# Raw result pages on disk. Page bodies are stored once per distinct content
+# under objects/ (named by their SHA-256, so identical pages such as captcha
+# walls share one file), and index/ maps each (engine, normalized query) to the
+# body it last returned and when it was fetched.
+class SerpCache:
+    def __init__(self, root="serp_cache", ttl=7 * 24 * 3600):
+        # ttl is in seconds; None keeps entries forever
+        self.root = root
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "index"), exist_ok=True)
+
+    def key(self, engine, query):
+        return hashlib.sha256(f"{engine}\n{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest + ".html.gz")
+
+    def index_path(self, engine, query):
+        return os.path.join(self.root, "index", self.key(engine, query) + ".json")
+
+    def write_atomic(self, path, data):
+        # Readers never see a half-written file, even from another process
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, engine, query, ttl=-1):
+        # Cached page HTML, or None when missing or older than ttl (default self.ttl)
+        ttl = self.ttl if ttl == -1 else ttl
+        try:
+            with open(self.index_path(engine, query), encoding='utf-8') as f:
+                entry = json.load(f)
+            if ttl is not None and time.time() - entry["fetched"] > ttl:
+                self.misses += 1
+                return None
+            with gzip.open(self.object_path(entry["sha256"]), "rt", encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return content
+
+    def put(self, engine, query, content, url=None):
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            self.write_atomic(path, gzip.compress(data))
+        entry = {"query": query, "url": url, "sha256": digest, "fetched": time.time()}
+        self.write_atomic(self.index_path(engine, query), json.dumps(entry).encode('utf-8'))
+        return digest
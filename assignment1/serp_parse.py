@@ -0,0 +1,127 @@
+import io
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+# Result links on a DuckDuckGo HTML results page, most specific layout first
+SELECTORS = [
+    "div.result__body a.result__a",
+    "div.results a.result__a",
+    "div.links_main a.result__a",
+    "div.results_links a.large",
+    "article.result h2 a",
+    "div.result__title a",
+]
+COMBINED_SELECTOR = ", ".join(SELECTORS)
+
+
+# Every extractor returns the href of each matched link, ordered as if the
+# selectors were run one after another: links matched by the first selector
+# in document order, then the second selector's, and so on. A link matched by
+# several selectors is placed under the first. Empty hrefs are kept so the
+# caller can skip them the same way for every backend.
+
+def extract_bs4(content):
+    soup = BeautifulSoup(content, "html.parser")
+    hrefs = []
+    seen = set()
+    for selector in SELECTORS:
+        for link in soup.select(selector):
+            if id(link) not in seen:
+                seen.add(id(link))
+                hrefs.append(link.get('href'))
+    return hrefs
+
+
+def compile_selector(selector):
+    # "div.result__body a.result__a" -> [('div', {'result__body'}), ('a', {'result__a'})]
+    parts = []
+    for part in selector.split():
+        tag, *classes = part.split('.')
+        parts.append((tag or None, frozenset(classes)))
+    return parts
+
+
+COMPILED_SELECTORS = [compile_selector(selector) for selector in SELECTORS]
+
+
+def part_matches(part, tag, classes):
+    return (part[0] is None or part[0] == tag) and part[1] <= classes
+
+
+def extract_lxml(content):
+    # One walk over the parse events. For each selector the stack holds how
+    # many of its ancestor parts the currently open elements satisfy; matching
+    # them greedily from the left is exact for descendant-only selectors.
+    if etree is None:
+        raise ImportError("the lxml extractor requires lxml (pip install lxml)")
+    depth = [0] * len(COMPILED_SELECTORS)
+    stack = []
+    matches = []
+    position = 0
+    source = io.BytesIO(content.encode('utf-8'))
+    for event, element in etree.iterparse(source, events=('start', 'end'), html=True,
+                                          encoding='utf-8', recover=True):
+        if event == 'end':
+            depth = stack.pop()
+            continue
+        tag = element.tag
+        classes = frozenset(element.get('class', '').split())
+        stack.append(depth)
+        new_depth = list(depth)
+        for i, parts in enumerate(COMPILED_SELECTORS):
+            matched = depth[i]
+            if matched == len(parts) - 1 and part_matches(parts[-1], tag, classes):
+                matches.append((i, position, element.get('href')))
+                position += 1
+                break
+        for i, parts in enumerate(COMPILED_SELECTORS):
+            matched = depth[i]
+            if matched < len(parts) - 1 and part_matches(parts[matched], tag, classes):
+                new_depth[i] = matched + 1
+        depth = new_depth
+    matches.sort()
+    return [href for _, _, href in matches]
+
+
+def extract_selectolax(content):
+    # One combined query, then each hit is assigned to the first selector it matches
+    if LexborHTMLParser is None:
+        raise ImportError("the selectolax extractor requires selectolax (pip install selectolax)")
+    tree = LexborHTMLParser(content)
+    matches = []
+    seen = set()
+    for position, node in enumerate(tree.css(COMBINED_SELECTOR)):
+        # lexbor returns a node once per selector it matches
+        if node.mem_id in seen:
+            continue
+        seen.add(node.mem_id)
+        first = next(i for i, selector in enumerate(SELECTORS) if node.css_matches(selector))
+        matches.append((first, position, node.attributes.get('href')))
+    matches.sort()
+    return [href for _, _, href in matches]
+
+
+EXTRACTORS = {
+    'bs4': extract_bs4,
+    'lxml': extract_lxml,
+    'selectolax': extract_selectolax,
+}
+
+
+def default_extractor():
+    if LexborHTMLParser is not None:
+        return 'selectolax'
+    if etree is not None:
+        return 'lxml'
+    return 'bs4'
@@ -0,0 +1,91 @@
+import argparse
+import csv
+import glob
+import os
+import time
+
+import requests
+
+from links import LINK_PARSERS
+
+
+# Compares the link extractors on saved pages: time per page, throughput, and
+# whether each one finds exactly the same out-links as the BeautifulSoup path.
+#
+#   python bench_links.py --save 50      # save the first 50 HTML pages from visit_latimes.csv
+#   python bench_links.py                # benchmark every parser on pages/*.html
+
+
+def save_pages(visit_csv, out_dir, count):
+    os.makedirs(out_dir, exist_ok=True)
+    headers = {'User-Agent': 'Mozilla/5.0 (compatible; USCCrawler/1.0; +http://www.usc.edu/)'}
+    saved = 0
+    with open(visit_csv, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if saved >= count:
+                break
+            if 'text/html' not in row['ContentType']:
+                continue
+            try:
+                response = requests.get(row['URL'], headers=headers, timeout=10, verify=False)
+            except requests.RequestException as e:
+                print(f"Skipping {row['URL']}: {e}")
+                continue
+            path = os.path.join(out_dir, f'page{saved:04d}.html')
+            with open(path, 'w', encoding='utf-8') as out:
+                # The first line keeps the page's URL so links can be resolved later
+                out.write(row['URL'] + '\n')
+                out.write(response.text)
+            saved += 1
+    print(f"Saved {saved} pages to {out_dir}")
+
+
+def load_pages(pages_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.html'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            url = f.readline().strip()
+            pages.append((url, f.read()))
+    return pages
+
+
+def benchmark(pages, parsers, repeat):
+    total_bytes = sum(len(html.encode('utf-8')) for _, html in pages)
+    reference = [set(LINK_PARSERS['bs4'](html, url)) for url, html in pages]
+    print(f"{len(pages)} pages, {total_bytes / 2 ** 20:.1f} MB")
+    print(f"{'parser':<8} {'ms/page':>9} {'MB/s':>8} {'speedup':>8}  out-links")
+
+    baseline = None
+    for name in parsers:
+        extract = LINK_PARSERS[name]
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = [extract(html, url) for url, html in pages]
+            best = min(best, time.perf_counter() - start)
+        if baseline is None:
+            baseline = best
+        mismatches = sum(1 for found, expected in zip(results, reference) if set(found) != expected)
+        same = "same as bs4" if not mismatches else f"{mismatches} pages differ from bs4"
+        print(f"{name:<8} {1000 * best / len(pages):>9.2f} {total_bytes / 2 ** 20 / best:>8.1f} "
+              f"{baseline / best:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', default='pages', help="directory of saved pages")
+    parser.add_argument('--save', type=int, default=0, help="first save this many pages from --visit-csv")
+    parser.add_argument('--visit-csv', default='visit_latimes.csv')
+    parser.add_argument('--parsers', nargs='+', default=list(LINK_PARSERS), choices=list(LINK_PARSERS))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.save:
+        requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+        save_pages(args.visit_csv, args.pages, args.save)
+
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"No saved pages in {args.pages}; run with --save N first")
+    else:
+        benchmark(pages, args.parsers, args.repeat)
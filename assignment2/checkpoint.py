@@ -0,0 +1,62 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+# Append-only crawl checkpoints in SQLite. Rather than snapshotting the whole
+# frontier every time, each checkpoint appends the URLs queued and the URLs
+# finished since the previous one; the frontier to resume from is whatever was
+# queued but never finished, in the order it was queued.
+class CrawlCheckpoint:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT, depth INTEGER)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS done (url TEXT PRIMARY KEY)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS checkpoints ("
+                              "id INTEGER PRIMARY KEY, created REAL, stats TEXT, offsets TEXT)")
+
+    def reset(self):
+        with self.lock, self.conn:
+            for table in ('seen', 'done', 'checkpoints'):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def save(self, seen, done, stats, offsets):
+        # seen is a list of (url, depth), done a list of URLs, both since the last save
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT INTO seen VALUES (?, ?)", seen)
+            self.conn.executemany("INSERT OR IGNORE INTO done VALUES (?)", ((url,) for url in done))
+            self.conn.execute("INSERT INTO checkpoints (created, stats, offsets) VALUES (?, ?, ?)",
+                              (time.time(), json.dumps(stats), json.dumps(offsets)))
+
+    def latest(self):
+        # Returns (stats, offsets) of the last checkpoint, or None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT stats, offsets FROM checkpoints ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def seen_urls(self):
+        cursor = self.conn.execute("SELECT url FROM seen")
+        for (url,) in cursor:
+            yield url
+
+    def frontier(self):
+        cursor = self.conn.execute(
+            "SELECT url, depth FROM seen WHERE url NOT IN (SELECT url FROM done) ORDER BY rowid")
+        for url, depth in cursor:
+            yield url, depth
+
+    def done_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM done").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
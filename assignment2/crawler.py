@@ -1,51 +1,227 @@
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import csv
+from urllib.parse import urlparse
 import time
 import random
 import ssl
 import re
 import threading
-from queue import Queue
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import argparse
+import os
+import zlib
+import multiprocessing
+import sys
+from queue import Empty
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from frontier import PoliteFrontier, parse_retry_after
+from seen import make_seen_store
+from checkpoint import CrawlCheckpoint
+from links import extract_links, LINK_PARSERS
+from output import BatchedWriter, EXTENSIONS
+from recrawl import RecrawlStore
+from linkgraph import EdgeSink, EDGE_SUFFIX
+from metrics import Metrics, serve_metrics, SnapshotWriter, SamplingProfiler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from urlcanon import UrlCanonicalizer
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+MEDIA_TYPES = ['application/pdf', 'image/jpeg', 'image/png', 'image/gif']
+
+# Largest body read for each content type (longest matching prefix wins);
+# bigger responses are abandoned instead of downloaded
+MAX_BODY_SIZES = {
+    'text/html': 10 * 2 ** 20,
+    'application/pdf': 50 * 2 ** 20,
+    'image/': 20 * 2 ** 20,
+}
+CHUNK_SIZE = 64 * 1024
+
+# Body returned for a response over its size cap: not a page and not a file
+ABANDONED = object()
+
+
+def content_length(headers):
+    value = headers.get('Content-Length', '')
+    return int(value) if value.isdigit() else None
 
 
 class Crawler:
-    def __init__(self, seed_url, max_pages=20000, max_depth=16, num_threads=4):
+    def __init__(self, seed_url, max_pages=20000, max_depth=16, num_threads=4, max_queue=1000000,
+                 min_delay=0.0, delay_factor=0.0, respect_robots=False, max_retries=3,
+                 seen_mode='exact', seen_capacity=1 << 20,
+                 checkpoint_path=None, checkpoint_every=500, resume=False, output_suffix='',
+                 link_parser='bs4', output_format='csv', recrawl_path=None, max_body_sizes=None,
+                 verbose=True, metrics_port=None, metrics_path=None, metrics_every=10.0, profile_path=None):
         self.seed_url = seed_url
         self.max_pages = max_pages
         self.max_depth = max_depth
         self.num_threads = num_threads
-        self.visited_urls = set()
-        self.url_queue = Queue()
-        self.url_queue.put((seed_url, 0))
-        self.domain = urlparse(seed_url).netloc
-
-        # CSV file handlers
-        self.fetch_csv = csv.writer(open('fetch_latimes.csv', 'w', newline=''))
-        self.visit_csv = csv.writer(open('visit_latimes.csv', 'w', newline=''))
-        self.urls_csv = csv.writer(open('urls_latimes.csv', 'w', newline=''))
-
-        # Write headers
-        self.fetch_csv.writerow(['URL', 'Status'])
-        self.visit_csv.writerow(['URL', 'Size', 'OutLinks', 'ContentType'])
-        self.urls_csv.writerow(['URL', 'Valid'])
+        self.max_retries = max_retries
+        self.link_parser = link_parser
+        self.max_body_sizes = dict(MAX_BODY_SIZES, **(max_body_sizes or {}))
+        self.retries = {}
+        # Links are canonicalized before dedup, so "#top", tracking parameters or
+        # parameter order no longer make a page look new. The host and trailing
+        # slash are kept as written, since the result still has to be fetched.
+        self.urls = UrlCanonicalizer(strip_www=False, strip_trailing_slash=False)
+        # Every URL ever queued; links are deduped here before they reach the frontier
+        self.seen_mode = seen_mode
+        self.seen_urls = make_seen_store(seen_mode, seen_capacity)
+        # One keep-alive session per worker thread
+        self.local = threading.local()
 
         # User agent
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (compatible; USCCrawler/1.0; +http://www.usc.edu/)'
         }
 
+        # Locks for thread-safe operations
+        self.stats_lock = threading.Lock()
+        self.visit_lock = threading.Lock()
+
+        self.url_queue = PoliteFrontier(maxsize=max_queue, min_delay=min_delay, delay_factor=delay_factor,
+                                        respect_robots=respect_robots, user_agent='USCCrawler',
+                                        fetch_robots=self.fetch_robots)
+        self.domain = urlparse(seed_url).netloc
+
+        # Work done since the last checkpoint: (url, depth) queued and URLs finished
+        self.new_seen = []
+        self.new_done = []
+        self.requeued = set()
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint = CrawlCheckpoint(checkpoint_path) if checkpoint_path else None
+        self.checkpoint_lock = threading.Lock()
+
         # Statistics
         self.pages_crawled = 0
         self.successful_crawls = 0
         self.failed_crawls = 0
-
-        # Locks for thread-safe operations
-        self.csv_lock = threading.Lock()
-        self.stats_lock = threading.Lock()
-        self.print_lock = threading.Lock()
+        self.oversized = 0
+        self.worker_stats = {}
+
+        restored = self.checkpoint.latest() if self.checkpoint and resume else None
+        if restored:
+            stats, offsets = restored
+            self.restore(stats)
+        else:
+            offsets = None
+            if self.checkpoint:
+                self.checkpoint.reset()
+            self.enqueue(seed_url, 0)
+
+        # Output files, written by a single background thread
+        self.output = BatchedWriter(output_format)
+        self.output.open('fetch', f'fetch_latimes{output_suffix}', ['URL', 'Status'], offsets)
+        self.output.open('visit', f'visit_latimes{output_suffix}', ['URL', 'Size', 'OutLinks', 'ContentType'], offsets)
+        self.output.open('urls', f'urls_latimes{output_suffix}', ['URL', 'Valid'], offsets)
+        # Page-to-page edges, for pagerank.py
+        links_root = f'links_latimes{output_suffix}'
+        self.output.attach('links', EdgeSink(links_root, None if offsets is None else offsets.get(links_root + EDGE_SUFFIX)))
+
+        # Validators, hashes and links from earlier crawls, for conditional refetches
+        self.recrawl = RecrawlStore(recrawl_path) if recrawl_path else None
+        if self.recrawl:
+            self.output.open('dups', f'dups_latimes{output_suffix}', ['URL', 'DuplicateOf'], offsets)
+
+        # Per-page lines are optional; the metrics below carry the same information
+        self.verbose = verbose
+        self.metrics = Metrics()
+        self.describe_metrics()
+        self.metrics_server = serve_metrics(self.metrics, metrics_port) if metrics_port else None
+        self.snapshots = SnapshotWriter(self.metrics, metrics_path, metrics_every) if metrics_path else None
+        self.profiler = SamplingProfiler(profile_path) if profile_path else None
+
+    def describe_metrics(self):
+        metrics = self.metrics
+        metrics.describe('fetch_seconds', 'histogram', "Time to response headers, by host and status")
+        metrics.describe('parse_seconds', 'histogram', "Time to extract links from a page, including any wait for a parse process")
+        metrics.describe('downloaded_bytes_total', 'counter', "Body bytes read, by content type")
+        metrics.describe('worker_busy_seconds_total', 'counter', "Time each worker spent on pages")
+        metrics.describe('worker_idle_seconds_total', 'counter', "Time each worker waited for the frontier")
+        metrics.gauge('pages_crawled', lambda: self.pages_crawled, "Pages started so far")
+        metrics.gauge('successful_crawls', lambda: self.successful_crawls, "Fetches that succeeded")
+        metrics.gauge('failed_crawls', lambda: self.failed_crawls, "Fetches that failed")
+        metrics.gauge('queue_depth', lambda: self.url_queue.qsize(), "URLs waiting in the frontier")
+        metrics.gauge('in_flight', lambda: self.url_queue.in_progress, "URLs taken from the frontier and not done")
+        metrics.gauge('seen_urls', lambda: len(self.seen_urls), "Unique URLs queued so far")
+        metrics.gauge('dropped_urls', lambda: self.url_queue.dropped, "URLs dropped because the frontier was full")
+
+    def log(self, message, always=False):
+        # One write per message and no lock: lines from different workers may
+        # interleave with each other but never within a line
+        if always or self.verbose:
+            sys.stdout.write(message + '\n')
+
+    def record_fetch(self, url, status, latency, retry_after=None):
+        self.url_queue.record(url, status, latency, retry_after)
+        self.metrics.observe('fetch_seconds', latency, host=urlparse(url).netloc,
+                             status=status if status is not None else 'error')
+
+    def restore(self, stats):
+        for url in self.checkpoint.seen_urls():
+            self.seen_urls.add(url)
+        for item in self.checkpoint.frontier():
+            self.push(item)
+        self.pages_crawled = self.checkpoint.done_count()
+        self.successful_crawls = stats['successful_crawls']
+        self.failed_crawls = stats['failed_crawls']
+        print(f"Resuming from checkpoint {self.checkpoint.path}: {self.pages_crawled} pages done, "
+              f"{self.url_queue.qsize()} URLs left to visit")
+
+    def finish_page(self, url):
+        with self.visit_lock:
+            if url in self.requeued:
+                self.requeued.discard(url)
+                return
+        # Under the lock save_checkpoint() swaps the lists with, so no entry
+        # lands in a list that has already been saved
+        with self.stats_lock:
+            self.new_done.append(url)
+            due = len(self.new_done) >= self.checkpoint_every
+        if self.checkpoint and self.checkpoint_every and due:
+            # Other workers carry on if a checkpoint is already being written;
+            # the next page to finish tries again
+            if self.checkpoint_lock.acquire(blocking=False):
+                try:
+                    # Someone else may have saved since `due` was taken
+                    if len(self.new_done) >= self.checkpoint_every:
+                        self.save_checkpoint()
+                finally:
+                    self.checkpoint_lock.release()
+
+    def save_checkpoint(self):
+        with self.stats_lock:
+            seen, self.new_seen = self.new_seen, []
+            done, self.new_done = self.new_done, []
+            stats = {'successful_crawls': self.successful_crawls, 'failed_crawls': self.failed_crawls}
+        # Every page in `done` queued its rows before being marked done, so
+        # flushing now puts all of them before the recorded offsets
+        offsets = self.output.flush()
+        self.checkpoint.save(seen, done, stats, offsets)
+
+    def close(self):
+        with self.checkpoint_lock:
+            if self.checkpoint:
+                self.save_checkpoint()
+        self.output.close()
+        if self.snapshots:
+            self.snapshots.stop()
+        if self.profiler:
+            self.profiler.stop()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+        if self.recrawl:
+            print(f"Recrawl: {self.recrawl.not_modified} not modified, {self.recrawl.unchanged} unchanged bodies, "
+                  f"{self.recrawl.near_duplicates} near-duplicates, "
+                  f"{self.recrawl.bytes_saved / 2 ** 20:.1f} MB not downloaded")
+            self.recrawl.close()
 
     def is_valid(self, url):
         parsed = urlparse(url)
@@ -73,106 +249,646 @@ class Crawler:
         print(f"Number of threads: {self.num_threads}")
         print("Crawling in progress...")
 
+        # Each thread runs a long-lived worker loop instead of one fetch per
+        # round, so a slow response only ever holds up its own worker
+        start = time.perf_counter()
+        interrupted = False
         with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
-            while self.pages_crawled < self.max_pages:
-                futures = []
-                for _ in range(self.num_threads):
-                    if not self.url_queue.empty():
-                        futures.append(executor.submit(self.fetch_url))
-                    else:
-                        break
+            futures = [executor.submit(self.worker, i) for i in range(self.num_threads)]
+            try:
                 for future in futures:
                     future.result()
+            except KeyboardInterrupt:
+                # Workers finish the page in hand and leave next_item(); the
+                # caller's close() still writes the checkpoint
+                print("Interrupted, stopping after the pages in progress...")
+                self.url_queue.close()
+                interrupted = True
+
+        self.report_utilization(time.perf_counter() - start)
+        if interrupted:
+            raise KeyboardInterrupt
+
+    def worker(self, worker_id):
+        busy = idle = 0.0
+        pages = 0
+        while True:
+            wait_start = time.perf_counter()
+            item = self.next_item()
+            work_start = time.perf_counter()
+            idle += work_start - wait_start
+            if item is None:
+                break
+
+            url, depth = item
+            try:
+                # Links are deduped at enqueue, so every item here is a new URL
+                if self.start_visit(url, depth):
+                    self.fetch_url(url, depth)
+                    self.finish_page(url)
+                    pages += 1
+                    self.report_progress()
+            finally:
+                self.task_done()
+            work_time = time.perf_counter() - work_start
+            busy += work_time
+            self.metrics.inc('worker_busy_seconds_total', work_time, worker=worker_id)
+            self.metrics.inc('worker_idle_seconds_total', work_start - wait_start, worker=worker_id)
+
+            if self.pages_crawled >= self.max_pages:
+                self.url_queue.close()
 
-                if self.url_queue.empty() and len(futures) == 0:
-                    break
+        with self.stats_lock:
+            self.worker_stats[worker_id] = (busy, idle, pages)
+
+    def next_item(self):
+        return self.url_queue.get()
+
+    def task_done(self):
+        self.url_queue.task_done()
+
+    def report_utilization(self, elapsed):
+        print(f"Worker utilization over {elapsed:.1f}s:")
+        for worker_id, (busy, idle, pages) in sorted(self.worker_stats.items()):
+            total = busy + idle
+            pct = 100 * busy / total if total else 0
+            print(f"  worker {worker_id}: {pages} pages, busy {busy:.1f}s, idle {idle:.1f}s ({pct:.1f}% busy)")
+        if self.url_queue.dropped:
+            print(f"URLs dropped because the frontier was full: {self.url_queue.dropped}")
+        if self.url_queue.disallowed:
+            print(f"URLs skipped because of robots.txt: {self.url_queue.disallowed}")
+        if self.oversized:
+            print(f"Bodies abandoned for exceeding the size cap: {self.oversized}")
+        print(f"Unique URLs seen: {len(self.seen_urls)} "
+              f"({self.seen_urls.memory_bytes() / 2 ** 20:.1f} MB in the '{self.seen_mode}' store)")
+        canon = self.urls.stats()
+        print(f"URL canonicalization cache: {canon['hit_rate'] * 100:.1f}% hits "
+              f"({canon['hits']} hits, {canon['misses']} misses)")
+
+    def report_progress(self):
+        # Print progress every 10 pages
+        if self.pages_crawled % 10 == 0:
+            self.log(f"Pages crawled: {self.pages_crawled}\n"
+                     f"Successful crawls: {self.successful_crawls}\n"
+                     f"Failed crawls: {self.failed_crawls}\n"
+                     f"URLs left to visit: {self.url_queue.qsize()}\n"
+                     "---", always=True)
+
+    def start_visit(self, url, depth):
+        # Returns False when the URL should not be fetched
+        if depth > self.max_depth:
+            return False
 
-                # Print progress every 10 pages
-                if self.pages_crawled % 10 == 0:
-                    with self.print_lock:
-                        print(f"Pages crawled: {self.pages_crawled}")
-                        print(f"Successful crawls: {self.successful_crawls}")
-                        print(f"Failed crawls: {self.failed_crawls}")
-                        print(f"URLs left to visit: {self.url_queue.qsize()}")
-                        print("---")
+        with self.visit_lock:
+            if self.pages_crawled >= self.max_pages:
+                return False
+            self.pages_crawled += 1
 
-    def fetch_url(self):
-        url, depth = self.url_queue.get()
+        self.log(f"Crawling: {url} (Depth: {depth})")
+        return True
 
-        if depth > self.max_depth or url in self.visited_urls:
-            return
+    def handle_status(self, url, depth, status, headers):
+        # Records the fetch and returns the content type when the body is worth reading
+        self.output.write('fetch', [[url, status]])
 
-        self.visited_urls.add(url)
+        if status == 200:
+            with self.stats_lock:
+                self.successful_crawls += 1
+            content_type = headers.get('Content-Type', '').split(';')[0]
+            if 'text/html' in content_type or any(t in content_type for t in MEDIA_TYPES):
+                return content_type
+
+        elif status in [429, 503] and self.retry_later(url, depth, headers):
+            pass
+
+        elif status in [301, 302]:
+            new_url = headers.get('Location')
+            if new_url and self.is_valid(new_url):
+                self.enqueue(new_url, depth)
+                self.output.write('links', [[url, [self.urls.canonicalize(new_url)]]])
+            self.log(f"Redirect to: {new_url}")
+
+        else:
+            with self.stats_lock:
+                self.failed_crawls += 1
+            self.log(f"Failed to crawl: Status code {status}")
+
+        return None
+
+    def enqueue(self, url, depth):
+        url = self.urls.canonicalize(url)
+        if depth <= self.max_depth and self.seen_urls.add(url):
+            with self.stats_lock:
+                self.new_seen.append((url, depth))
+            self.push((url, depth))
+
+    def push(self, item):
+        return self.url_queue.put(item)
+
+    def retry_later(self, url, depth, headers):
+        # The host has already been told to back off; give the URL another go later.
+        # It is already in seen_urls, so it goes straight back on the frontier
+        with self.visit_lock:
+            attempts = self.retries.get(url, 0)
+            if attempts >= self.max_retries:
+                return False
+            self.retries[url] = attempts + 1
+            self.requeued.add(url)
+            self.pages_crawled -= 1
+        self.push((url, depth))
+        self.log(f"Throttled, will retry later: {url} (Retry-After: {headers.get('Retry-After')})")
+        return True
 
+    def handle_page(self, url, depth, size, content_type, links):
+        # links is None for downloaded (non-HTML) files
+        if links is None:
+            self.output.write('visit', [[url, size, 0, content_type]])
+            self.log(f"Downloaded {content_type} file")
+            return
+
+        out_links = set()
+        rows = []
+        for full_url in self.urls.canonicalize_many(links):
+            out_links.add(full_url)
+            if self.is_valid(full_url):
+                self.enqueue(full_url, depth + 1)
+                rows.append([full_url, 'OK'])
+            else:
+                rows.append([full_url, 'N_OK'])
+
+        # One hand-off per page rather than one locked write per link
+        self.output.write('urls', rows)
+        self.output.write('visit', [[url, size, len(out_links), content_type]])
+        self.output.write('links', [[url, out_links]])
+        self.log(f"Found {len(out_links)} outgoing links")
+
+    def request_headers(self, url):
+        if self.recrawl is None:
+            return self.headers
+        return dict(self.headers, **self.recrawl.request_headers(url))
+
+    def handle_not_modified(self, url, depth):
+        # Replay what the previous crawl stored instead of downloading the page again
+        self.output.write('fetch', [[url, 304]])
         with self.stats_lock:
-            self.pages_crawled += 1
-        with self.print_lock:
-            print(f"Crawling: {url} (Depth: {depth})")
+            self.successful_crawls += 1
+        record = self.recrawl.record_not_modified(url)
+        if record is not None:
+            self.handle_page(url, depth, record.size, record.content_type, record.links)
+
+    def remember_page(self, url, headers, body, content_type, html, links):
+        if html is None and links is not None:
+            # The body matched the stored hash and was never parsed
+            self.recrawl.touch(url, headers)
+            return
+        duplicate_of = self.recrawl.remember(url, headers, body, content_type, html, links)
+        if duplicate_of:
+            self.output.write('dups', [[url, duplicate_of]])
+            self.log(f"Near-duplicate of {duplicate_of}")
+
+    def body_limit(self, content_type):
+        matches = [prefix for prefix in self.max_body_sizes if content_type.startswith(prefix)]
+        if not matches:
+            return max(self.max_body_sizes.values())
+        return self.max_body_sizes[max(matches, key=len)]
+
+    def known_size(self, url, content_type, headers):
+        # (size, body) for a body that never needs reading: files are only
+        # recorded by size, and anything declared over the cap is abandoned unread
+        length = content_length(headers)
+        if length is None:
+            return None
+        if length > self.body_limit(content_type):
+            self.abandon(url, length)
+            return length, ABANDONED
+        if 'text/html' not in content_type:
+            return length, None
+        return None
+
+    def abandon(self, url, size):
+        with self.stats_lock:
+            self.oversized += 1
+        self.log(f"Body too large, abandoned after {size} bytes: {url}")
+
+    def read_body(self, url, response, content_type):
+        # Returns (size, body); body is None when only the size was needed and
+        # ABANDONED when the body went over the cap
+        known = self.known_size(url, content_type, response.headers)
+        if known is not None:
+            return known
+        limit = self.body_limit(content_type)
+        keep = 'text/html' in content_type
+        size = 0
+        chunks = []
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                self.metrics.inc('downloaded_bytes_total', size, content_type=content_type)
+                self.abandon(url, size)
+                return size, ABANDONED
+            if keep:
+                chunks.append(chunk)
+        self.metrics.inc('downloaded_bytes_total', size, content_type=content_type)
+        return size, b''.join(chunks) if keep else None
+
+    def discard(self, response):
+        # Small unwanted bodies (error pages, redirects) are drained so the
+        # keep-alive connection goes back to the pool; big ones are dropped with it
+        length = content_length(response.headers)
+        if length is not None and length > CHUNK_SIZE:
+            return
+        read = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            read += len(chunk)
+            if read > CHUNK_SIZE:
+                return
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def fetch_robots(self, url, timeout):
+        response = self.session().get(url, headers=self.headers, timeout=timeout, verify=False)
+        return response.status_code, response.text
+
+    def handle_error(self, url, e):
+        with self.stats_lock:
+            self.failed_crawls += 1
+        self.log(f"Error crawling {url}: {str(e)}")
+        self.output.write('fetch', [[url, 'FAILED']])
 
+    def fetch_url(self, url, depth):
+        start = time.perf_counter()
         try:
-            response = requests.get(url, headers=self.headers, timeout=10, verify=False)
+            # Headers first; the body is only read when it is wanted and small enough
+            response = self.session().get(url, headers=self.request_headers(url), timeout=10, verify=False,
+                                          stream=True)
             requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+            with response:
+                self.record_fetch(url, response.status_code, time.perf_counter() - start,
+                                  parse_retry_after(response.headers.get('Retry-After')))
+
+                if response.status_code == 304 and self.recrawl:
+                    self.discard(response)
+                    self.handle_not_modified(url, depth)
+                    return
+
+                content_type = self.handle_status(url, depth, response.status_code, response.headers)
+                if not content_type:
+                    self.discard(response)
+                    return
+                size, body = self.read_body(url, response, content_type)
+                encoding = response.encoding or 'utf-8'
+            if body is ABANDONED:
+                # Counted and logged by abandon(); no visit row
+                return
+
+            html = links = None
+            if body is not None:
+                links = self.recrawl.unchanged_links(url, body) if self.recrawl else None
+                if links is None:
+                    html = body.decode(encoding, errors='replace')
+                    parse_start = time.perf_counter()
+                    links = extract_links(html, url, self.link_parser)
+                    self.metrics.observe('parse_seconds', time.perf_counter() - parse_start)
+            self.handle_page(url, depth, size, content_type, links)
+            if self.recrawl and body is not None:
+                self.remember_page(url, response.headers, body, content_type, html, links)
 
-            with self.csv_lock:
-                self.fetch_csv.writerow([url, response.status_code])
-
-            if response.status_code == 200:
-                with self.stats_lock:
-                    self.successful_crawls += 1
-                content_type = response.headers.get('Content-Type', '').split(';')[0]
-
-                if 'text/html' in content_type:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    links = soup.find_all('a')
-                    out_links = set()
-
-                    for link in links:
-                        href = link.get('href')
-                        if href:
-                            full_url = urljoin(url, href)
-                            out_links.add(full_url)
-                            if self.is_valid(full_url):
-                                self.url_queue.put((full_url, depth + 1))
-                                with self.csv_lock:
-                                    self.urls_csv.writerow([full_url, 'OK'])
-                            else:
-                                with self.csv_lock:
-                                    self.urls_csv.writerow([full_url, 'N_OK'])
-
-                    with self.csv_lock:
-                        self.visit_csv.writerow([url, len(response.content), len(out_links), content_type])
-                    with self.print_lock:
-                        print(f"Found {len(out_links)} outgoing links")
-                elif any(t in content_type for t in ['application/pdf', 'image/jpeg', 'image/png', 'image/gif']):
-                    with self.csv_lock:
-                        self.visit_csv.writerow([url, len(response.content), 0, content_type])
-                    with self.print_lock:
-                        print(f"Downloaded {content_type} file")
-
-            elif response.status_code in [301, 302]:
-                new_url = response.headers.get('Location')
-                if new_url and self.is_valid(new_url):
-                    self.url_queue.put((new_url, depth))
-                with self.print_lock:
-                    print(f"Redirect to: {new_url}")
+        except Exception as e:
+            self.record_fetch(url, None, time.perf_counter() - start)
+            self.handle_error(url, e)
+
+
+# Same bookkeeping and CSV output as Crawler, but all fetches run on a single
+# asyncio event loop over a pooled keep-alive aiohttp session, and HTML parsing
+# is pushed to a process pool so it does not block the loop.
+class AsyncCrawler(Crawler):
+
+    def __init__(self, seed_url, max_pages=20000, max_depth=16, num_threads=4, max_queue=1000000,
+                 concurrency=1000, per_host_limit=0, parse_workers=None, **kwargs):
+        # Before Crawler.__init__ truncates the output files
+        if aiohttp is None:
+            raise ImportError("AsyncCrawler requires aiohttp (pip install aiohttp)")
+        # Futures of workers waiting for the frontier; set to wake them
+        self.waiters = deque()
+        super().__init__(seed_url, max_pages=max_pages, max_depth=max_depth, num_threads=num_threads,
+                         max_queue=max_queue, **kwargs)
+        self.concurrency = concurrency
+        self.per_host_limit = per_host_limit  # 0 means no per-host cap
+        self.parse_workers = parse_workers or num_threads
 
-            else:
-                with self.stats_lock:
-                    self.failed_crawls += 1
-                with self.print_lock:
-                    print(f"Failed to crawl: Status code {response.status_code}")
+    def crawl(self):
+        print(f"Starting async crawl from {self.seed_url}")
+        print(f"Max pages to crawl: {self.max_pages}")
+        print(f"Max depth: {self.max_depth}")
+        print(f"Concurrent fetches: {self.concurrency}")
+        print(f"Parse workers: {self.parse_workers}")
+        print("Crawling in progress...")
+        asyncio.run(self.crawl_async())
+
+    async def crawl_async(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_host_limit,
+            ssl=False,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(total=10)
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            async with aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=timeout) as session:
+                workers = [asyncio.create_task(self.worker(session, pool)) for _ in range(self.concurrency)]
+                await asyncio.gather(*workers)
+
+    def push(self, item):
+        # Everything that queues URLs runs on the event loop thread
+        if super().push(item):
+            self.wake(1)
+            return True
+        return False
+
+    def wake(self, n=None):
+        while self.waiters and (n is None or n > 0):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                n = None if n is None else n - 1
+
+    async def wait_for_work(self, timeout):
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+
+    async def worker(self, session, pool):
+        while self.pages_crawled < self.max_pages:
+            item, wait = self.url_queue.poll()
+            if item is None:
+                # Nothing queued and nobody fetching means the crawl is over
+                if self.url_queue.in_progress == 0 and self.url_queue.empty():
+                    self.wake()
+                    return
+                # Sleep until a URL is queued, or until a cooling host is ready
+                await self.wait_for_work(wait)
+                continue
+
+            url, depth = item
+            try:
+                if self.start_visit(url, depth):
+                    await self.fetch_url_async(session, pool, url, depth)
+                    self.finish_page(url)
+                    self.report_progress()
+            finally:
+                self.url_queue.task_done()
+                if self.pages_crawled >= self.max_pages or (self.url_queue.in_progress == 0
+                                                            and self.url_queue.empty()):
+                    # Let the waiting workers see that the crawl is over
+                    self.wake()
+
+    async def read_body_async(self, url, response, content_type):
+        known = self.known_size(url, content_type, response.headers)
+        if known is not None:
+            return known
+        limit = self.body_limit(content_type)
+        keep = 'text/html' in content_type
+        size = 0
+        chunks = []
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                self.metrics.inc('downloaded_bytes_total', size, content_type=content_type)
+                self.abandon(url, size)
+                return size, ABANDONED
+            if keep:
+                chunks.append(chunk)
+        self.metrics.inc('downloaded_bytes_total', size, content_type=content_type)
+        return size, b''.join(chunks) if keep else None
+
+    async def discard_async(self, response):
+        length = content_length(response.headers)
+        if length is not None and length > CHUNK_SIZE:
+            return
+        read = 0
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            read += len(chunk)
+            if read > CHUNK_SIZE:
+                return
+
+    async def load_robots(self, links):
+        # handle_page() checks every queued link against robots.txt; download
+        # the ones for new hosts on threads first so that never blocks the loop
+        origins = {}
+        for link in self.urls.canonicalize_many(links):
+            parsed = urlparse(link)
+            if parsed.netloc.endswith(self.domain) and not self.url_queue.has_robots(parsed.netloc):
+                origins.setdefault(parsed.netloc, parsed)
+        if origins:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(None, self.url_queue.robots_for, parsed)
+                                   for parsed in origins.values()))
+
+    async def fetch_url_async(self, session, pool, url, depth):
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=self.request_headers(url)) as response:
+                self.record_fetch(url, response.status, time.perf_counter() - start,
+                                  parse_retry_after(response.headers.get('Retry-After')))
+                if response.status == 304 and self.recrawl:
+                    await self.discard_async(response)
+                    self.handle_not_modified(url, depth)
+                    return
+                location = response.headers.get('Location')
+                if self.url_queue.respect_robots and response.status in (301, 302) and location:
+                    # handle_status() queues the redirect target
+                    await self.load_robots([location])
+                content_type = self.handle_status(url, depth, response.status, response.headers)
+                if not content_type:
+                    await self.discard_async(response)
+                    return
+                size, body = await self.read_body_async(url, response, content_type)
+                charset = response.charset or 'utf-8'
+                headers = response.headers
+            if body is ABANDONED:
+                return
+
+            html = links = None
+            if body is not None:
+                links = self.recrawl.unchanged_links(url, body) if self.recrawl else None
+                if links is None:
+                    html = body.decode(charset, errors='replace')
+                    loop = asyncio.get_running_loop()
+                    parse_start = time.perf_counter()
+                    links = await loop.run_in_executor(pool, extract_links, html, url, self.link_parser)
+                    self.metrics.observe('parse_seconds', time.perf_counter() - parse_start)
+            if self.url_queue.respect_robots and links:
+                await self.load_robots(links)
+            self.handle_page(url, depth, size, content_type, links)
+            if self.recrawl and body is not None:
+                self.remember_page(url, headers, body, content_type, html, links)
 
         except Exception as e:
-            with self.stats_lock:
-                self.failed_crawls += 1
-            with self.print_lock:
-                print(f"Error crawling {url}: {str(e)}")
-            with self.csv_lock:
-                self.fetch_csv.writerow([url, 'FAILED'])
+            self.record_fetch(url, None, time.perf_counter() - start)
+            self.handle_error(url, e)
+
+
+def shard_of(url, num_shards, partition='url'):
+    # crc32 rather than hash(), which is salted differently in every process
+    key = urlparse(url).netloc if partition == 'host' else url
+    return zlib.crc32(key.encode('utf-8')) % num_shards
+
+
+# One process of a sharded crawl. Each shard owns the URLs that hash to it and
+# forwards every other link it discovers to the owning shard's inbox.
+class ShardCrawler(Crawler):
+    def __init__(self, seed_url, shard_id, inboxes, outstanding, total_pages, partition='url', **kwargs):
+        self.shard_id = shard_id
+        self.inboxes = inboxes
+        self.num_shards = len(inboxes)
+        self.partition = partition
+        # Shared by all shards: URLs queued, in flight or in transit anywhere, and
+        # pages started so far. The crawl ends when outstanding drops to zero.
+        self.outstanding = outstanding
+        self.total_pages = total_pages
+        super().__init__(seed_url, output_suffix=f'.shard{shard_id}', **kwargs)
+        self.url_queue.close_when_drained = False
+        # Give back the startup token crawl_sharded handed to this shard
+        self.add_outstanding(-1)
+
+    def add_outstanding(self, n):
+        with self.outstanding.get_lock():
+            self.outstanding.value += n
+
+    def finished(self):
+        return self.outstanding.value <= 0 or self.total_pages.value >= self.max_pages
+
+    def enqueue(self, url, depth):
+        # Canonical first, so every spelling of a URL hashes to the same shard
+        url = self.urls.canonicalize(url)
+        owner = shard_of(url, self.num_shards, self.partition)
+        if owner == self.shard_id:
+            super().enqueue(url, depth)
+        elif depth <= self.max_depth and self.seen_urls.add(url):
+            # Remembered here as well, so each foreign link is only sent once
+            self.add_outstanding(1)
+            self.inboxes[owner].put((url, depth))
+
+    def push(self, item):
+        # Count the item before a worker can possibly finish it
+        self.add_outstanding(1)
+        if super().push(item):
+            return True
+        self.add_outstanding(-1)
+        return False
+
+    def task_done(self):
+        super().task_done()
+        self.add_outstanding(-1)
+
+    def next_item(self):
+        while not self.finished():
+            try:
+                item = self.url_queue.get(timeout=0.2)
+            except Empty:
+                continue
+            if item is not None:
+                return item
+            if self.url_queue.closed:
+                return None
+        self.url_queue.close()
+        return None
+
+    def start_visit(self, url, depth):
+        if depth > self.max_depth:
+            return False
+        with self.total_pages.get_lock():
+            if self.total_pages.value >= self.max_pages:
+                return False
+            self.total_pages.value += 1
+        return super().start_visit(url, depth)
+
+    def retry_later(self, url, depth, headers):
+        if not super().retry_later(url, depth, headers):
+            return False
+        with self.total_pages.get_lock():
+            self.total_pages.value -= 1
+        return True
+
+    def receive(self):
+        inbox = self.inboxes[self.shard_id]
+        while not self.finished():
+            try:
+                url, depth = inbox.get(timeout=0.2)
+            except Empty:
+                continue
+            Crawler.enqueue(self, url, depth)
+            self.add_outstanding(-1)
 
-        # Politeness delay
-        #time.sleep(random.uniform(1, 3))
+    def crawl(self):
+        receiver = threading.Thread(target=self.receive, daemon=True)
+        receiver.start()
+        super().crawl()
+        receiver.join()
+
+
+def run_shard(seed_url, shard_id, inboxes, outstanding, total_pages, results, options):
+    crawler = ShardCrawler(seed_url, shard_id, inboxes, outstanding, total_pages, **options)
+    try:
+        crawler.crawl()
+    finally:
+        crawler.close()
+        # Links still queued for other shards when the page budget runs out must
+        # not keep this process alive at exit
+        for inbox in inboxes:
+            inbox.cancel_join_thread()
+    results.put((crawler.pages_crawled, crawler.successful_crawls, crawler.failed_crawls))
+
+
+def crawl_sharded(seed_url, num_shards, partition='url', checkpoint_path=None, **options):
+    # Returns (pages crawled, successful, failed) summed over all shards
+    inboxes = [multiprocessing.Queue() for _ in range(num_shards)]
+    # One startup token per shard so nobody sees zero before every shard has
+    # queued (or forwarded) the seed
+    outstanding = multiprocessing.Value('q', num_shards)
+    total_pages = multiprocessing.Value('q', 0)
+    results = multiprocessing.Queue()
+
+    processes = []
+    for shard_id in range(num_shards):
+        shard_options = dict(options, partition=partition)
+        if checkpoint_path:
+            root, ext = os.path.splitext(checkpoint_path)
+            shard_options['checkpoint_path'] = f'{root}.shard{shard_id}{ext}'
+        if options.get('recrawl_path'):
+            root, ext = os.path.splitext(options['recrawl_path'])
+            shard_options['recrawl_path'] = f'{root}.shard{shard_id}{ext}'
+        # Each shard serves and writes its own metrics
+        if options.get('metrics_port'):
+            shard_options['metrics_port'] = options['metrics_port'] + shard_id
+        for name in ('metrics_path', 'profile_path'):
+            if options.get(name):
+                root, ext = os.path.splitext(options[name])
+                shard_options[name] = f'{root}.shard{shard_id}{ext}'
+        process = multiprocessing.Process(
+            target=run_shard,
+            args=(seed_url, shard_id, inboxes, outstanding, total_pages, results, shard_options),
+        )
+        process.start()
+        processes.append(process)
 
+    totals = [0, 0, 0]
+    for _ in processes:
+        for i, value in enumerate(results.get()):
+            totals[i] += value
+    for process in processes:
+        process.join()
+    return tuple(totals)
 
 if __name__ == "__main__":
     # Disable SSL verification warnings
@@ -183,12 +899,90 @@ if __name__ == "__main__":
 
     ssl._create_default_https_context = ssl._create_unverified_context
 
-    crawler = Crawler("https://www.latimes.com/", max_pages=20000, max_depth=16, num_threads=4)
-    crawler.crawl()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', default="https://www.latimes.com/")
+    parser.add_argument('--max-pages', type=int, default=20000)
+    parser.add_argument('--max-depth', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--max-queue', type=int, default=1000000,
+                        help="bound on queued URLs; extra links are dropped")
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help="minimum seconds between fetches to the same host")
+    parser.add_argument('--delay-factor', type=float, default=0.0,
+                        help="also wait this many times the host's average response time")
+    parser.add_argument('--robots', action='store_true', help="honour robots.txt rules and Crawl-delay")
+    parser.add_argument('--seen', choices=['exact', 'fingerprint', 'bloom'], default='exact',
+                        help="seen-URL store: full strings, 64-bit hashes, or a Bloom filter")
+    parser.add_argument('--seen-capacity', type=int, default=1 << 20,
+                        help="expected number of unique URLs, used to size the seen store")
+    parser.add_argument('--checkpoint', default='crawl_latimes.db',
+                        help="SQLite file for periodic checkpoints")
+    parser.add_argument('--checkpoint-every', type=int, default=500,
+                        help="pages between checkpoints (0 disables them)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue from the last checkpoint instead of starting over")
+    parser.add_argument('--parser', choices=list(LINK_PARSERS), default='bs4',
+                        help="link extractor: full BeautifulSoup tree, streaming tokenizer, or lxml iterparse")
+    parser.add_argument('--output-format', choices=list(EXTENSIONS), default='csv',
+                        help="write plain CSV, gzip-compressed CSV, or Parquet (needs pyarrow)")
+    parser.add_argument('--recrawl', metavar='PATH',
+                        help="SQLite store of ETags, Last-Modified and content hashes; refetches become "
+                             "conditional and unchanged pages are not parsed again")
+    parser.add_argument('--max-body', action='append', default=[], metavar='TYPE=MB',
+                        help="size cap for a content type prefix, e.g. text/html=5 or image/=2 (repeatable)")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="split the crawl across this many processes")
+    parser.add_argument('--partition', choices=['url', 'host'], default='url',
+                        help="assign URLs to shards by hashing the whole URL or just its host")
+    parser.add_argument('--engine', choices=['threaded', 'async'], default='threaded')
+    parser.add_argument('--concurrency', type=int, default=1000,
+                        help="fetches kept in flight by the async engine")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve live metrics on http://127.0.0.1:PORT/metrics (and /metrics.json)")
+    parser.add_argument('--metrics-json', metavar='PATH', help="rewrite a JSON metrics snapshot to PATH periodically")
+    parser.add_argument('--metrics-every', type=float, default=10.0, help="seconds between JSON snapshots")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="sample worker stacks and write them to PATH in folded format (for flame graphs)")
+    parser.add_argument('--quiet', action='store_true',
+                        help="skip the per-page log lines and keep only the progress summary")
+    args = parser.parse_args()
+
+    max_body_sizes = {}
+    for spec in args.max_body:
+        content_type, _, mb = spec.partition('=')
+        if not mb:
+            parser.error(f"--max-body expects TYPE=MB, got '{spec}'")
+        max_body_sizes[content_type] = int(float(mb) * 2 ** 20)
+
+    options = dict(max_pages=args.max_pages, max_depth=args.max_depth, num_threads=args.threads,
+                   max_queue=args.max_queue, min_delay=args.delay, delay_factor=args.delay_factor,
+                   respect_robots=args.robots, seen_mode=args.seen, seen_capacity=args.seen_capacity,
+                   checkpoint_path=args.checkpoint if args.checkpoint_every else None,
+                   checkpoint_every=args.checkpoint_every, resume=args.resume,
+                   link_parser=args.parser, output_format=args.output_format, recrawl_path=args.recrawl,
+                   max_body_sizes=max_body_sizes, verbose=not args.quiet, metrics_port=args.metrics_port,
+                   metrics_path=args.metrics_json, metrics_every=args.metrics_every, profile_path=args.profile)
+    if args.shards > 1:
+        options.pop('checkpoint_path')
+        pages_crawled, successful_crawls, failed_crawls = crawl_sharded(
+            args.seed, args.shards, partition=args.partition,
+            checkpoint_path=args.checkpoint if args.checkpoint_every else None, **options)
+    else:
+        if args.engine == 'async':
+            crawler = AsyncCrawler(args.seed, concurrency=args.concurrency, **options)
+        else:
+            crawler = Crawler(args.seed, **options)
+        try:
+            crawler.crawl()
+        finally:
+            crawler.close()
+        pages_crawled, successful_crawls, failed_crawls = \
+            crawler.pages_crawled, crawler.successful_crawls, crawler.failed_crawls
 
     print("\nCrawling completed.")
-    print(f"Total pages crawled: {crawler.pages_crawled}")
-    print(f"Successful crawls: {crawler.successful_crawls}")
-    print(f"Failed crawls: {crawler.failed_crawls}")
-    print(f"Number of threads used: {crawler.num_threads}")
+    print(f"Total pages crawled: {pages_crawled}")
+    print(f"Successful crawls: {successful_crawls}")
+    print(f"Failed crawls: {failed_crawls}")
+    print(f"Number of threads used: {args.threads}" +
+          (f" in each of {args.shards} processes" if args.shards > 1 else ""))
     print("Check the CSV files for detailed results.")
\ No newline at end of file
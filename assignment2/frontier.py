@@ -0,0 +1,322 @@
+import heapq
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from queue import Empty
+from urllib.error import HTTPError
+from urllib.parse import urlparse
+from urllib.request import urlopen
+from urllib.robotparser import RobotFileParser
+
+
+# Bounded FIFO frontier shared by all crawl workers. Unlike queue.Queue it knows
+# how many URLs are still being worked on, so a worker blocked in get() can tell
+# "nothing queued yet" apart from "the crawl is finished".
+class Frontier:
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize  # 0 means unbounded
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.in_progress = 0
+        self.dropped = 0
+        self.closed = False
+        # Sharded crawls get more work from other processes, so an empty frontier
+        # with nothing in progress does not mean the crawl is over
+        self.close_when_drained = True
+
+    def put(self, item):
+        with self.cond:
+            if self.closed:
+                return False
+            if self.maxsize and len(self.items) >= self.maxsize:
+                # Never block a producer: workers are the only producers, so
+                # blocking here could deadlock every worker on a full queue
+                self.dropped += 1
+                return False
+            self.items.append(item)
+            self.cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        # Returns None once the frontier is closed or fully drained
+        with self.cond:
+            while not self.items:
+                if self.closed or (self.close_when_drained and self.in_progress == 0):
+                    self.closed = True
+                    self.cond.notify_all()
+                    return None
+                if not self.cond.wait(timeout):
+                    raise Empty
+            self.in_progress += 1
+            return self.items.popleft()
+
+    def get_nowait(self):
+        with self.cond:
+            if not self.items:
+                raise Empty
+            self.in_progress += 1
+            return self.items.popleft()
+
+    def task_done(self):
+        with self.cond:
+            self.in_progress -= 1
+            if self.in_progress == 0 and not self.items:
+                self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+
+class HostState:
+    __slots__ = ('queue', 'next_fetch', 'delay', 'crawl_delay', 'latency', 'error_rate', 'errors')
+
+    def __init__(self, delay):
+        self.queue = deque()
+        self.next_fetch = 0.0
+        self.delay = delay
+        self.crawl_delay = 0.0
+        self.latency = 0.0  # EWMA of fetch latency in seconds
+        self.error_rate = 0.0  # EWMA of the fraction of failed fetches
+        self.errors = 0  # consecutive failures
+
+
+# Frontier that keeps one queue per host and a heap of next-allowed-fetch times.
+# get() hands out a URL from whichever host is ready soonest, so a worker never
+# sleeps on a host that is cooling down while another host has work.
+class PoliteFrontier(Frontier):
+    def __init__(self, maxsize=0, min_delay=0.0, max_delay=60.0, delay_factor=0.0,
+                 respect_robots=False, user_agent='*', smoothing=0.3, fetch_robots=None, robots_timeout=10.0):
+        super().__init__(maxsize)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        # Wait delay_factor times the host's average response time between fetches
+        self.delay_factor = delay_factor
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self.smoothing = smoothing
+        self.hosts = {}
+        self.ready = []  # heap of (next_fetch, host) for hosts with queued URLs
+        self.size = 0
+        self.disallowed = 0
+        # host -> RobotFileParser, None (no usable robots.txt), or an Event
+        # while one thread downloads it
+        self.robots = {}
+        self.robots_lock = threading.Lock()
+        # fetch_robots(url, timeout) -> (status, text); the crawler passes one
+        # that uses its own HTTP session
+        self.fetch_robots = fetch_robots or fetch_robots_txt
+        self.robots_timeout = robots_timeout
+
+    def put(self, item):
+        url = item[0]
+        parsed = urlparse(url)
+        host = parsed.netloc
+        if self.respect_robots:
+            robots = self.robots_for(parsed)
+            if robots is not None and not robots.can_fetch(self.user_agent, url):
+                self.disallowed += 1
+                return False
+
+        with self.cond:
+            if self.closed:
+                return False
+            if self.maxsize and self.size >= self.maxsize:
+                self.dropped += 1
+                return False
+            state = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = HostState(self.min_delay)
+                self.apply_crawl_delay(host, state)
+            if not state.queue:
+                heapq.heappush(self.ready, (state.next_fetch, host))
+            state.queue.append(item)
+            self.size += 1
+            self.cond.notify()
+            return True
+
+    def pop_ready(self, now):
+        # Returns (item, 0) for a fetchable URL, or (None, seconds until one is ready)
+        while self.ready:
+            ready_at, host = self.ready[0]
+            state = self.hosts[host]
+            if state.next_fetch > ready_at:
+                # The host was pushed back after this entry was queued
+                heapq.heapreplace(self.ready, (state.next_fetch, host))
+                continue
+            if ready_at > now:
+                return None, ready_at - now
+
+            item = state.queue.popleft()
+            self.size -= 1
+            state.next_fetch = now + state.delay
+            if state.queue:
+                heapq.heapreplace(self.ready, (state.next_fetch, host))
+            else:
+                heapq.heappop(self.ready)
+            self.in_progress += 1
+            return item, 0
+        return None, None
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                if self.closed:
+                    return None
+                now = time.monotonic()
+                item, wait = self.pop_ready(now)
+                if item is not None:
+                    return item
+                if wait is None and self.in_progress == 0 and self.close_when_drained:
+                    self.closed = True
+                    self.cond.notify_all()
+                    return None
+                if deadline is not None:
+                    if now >= deadline:
+                        raise Empty
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self.cond.wait(wait)
+
+    def get_nowait(self):
+        with self.cond:
+            item, _ = self.pop_ready(time.monotonic())
+            if item is None:
+                raise Empty
+            return item
+
+    def poll(self):
+        # Non-blocking get for callers that wait elsewhere: (item, 0), or
+        # (None, seconds until a cooling host is ready, or None if nothing is queued)
+        with self.cond:
+            return self.pop_ready(time.monotonic())
+
+    def record(self, url, status, latency, retry_after=None):
+        # Feed back the outcome of a fetch so the host's delay can adapt
+        host = urlparse(url).netloc
+        failed = status is None or status == 429 or status >= 500
+        a = self.smoothing
+        with self.cond:
+            state = self.hosts.get(host)
+            if state is None:
+                return
+            state.latency = (1 - a) * state.latency + a * latency
+            state.error_rate = (1 - a) * state.error_rate + a * (1.0 if failed else 0.0)
+            state.errors = state.errors + 1 if failed else 0
+
+            delay = max(self.min_delay, state.crawl_delay, self.delay_factor * state.latency)
+            if state.errors and (self.min_delay or self.delay_factor):
+                # Exponential backoff on consecutive failures from the host's
+                # normal delay, scaled up further while its recent error rate
+                # stays high. With politeness off (no delay and no delay
+                # factor) failures only count towards Retry-After.
+                delay = delay * (2 ** min(state.errors, 6)) * (1 + state.error_rate)
+            state.delay = min(delay, self.max_delay)
+
+            now = time.monotonic()
+            next_fetch = now + state.delay
+            if retry_after is not None:
+                next_fetch = max(next_fetch, now + min(retry_after, self.max_delay * 10))
+            if next_fetch > state.next_fetch:
+                state.next_fetch = next_fetch
+            self.cond.notify_all()
+
+    def has_robots(self, host):
+        with self.robots_lock:
+            return host in self.robots and not isinstance(self.robots[host], threading.Event)
+
+    def robots_for(self, parsed):
+        host = parsed.netloc
+        with self.robots_lock:
+            robots = self.robots.get(host, False)
+            if robots is False:
+                # Only one thread downloads a host's robots.txt
+                done = self.robots[host] = threading.Event()
+        if isinstance(robots, threading.Event):
+            # Another thread is downloading it; its answer applies here too
+            robots.wait()
+            with self.robots_lock:
+                return self.robots[host]
+        if robots is not False:
+            return robots
+
+        try:
+            robots = self.read_robots(f"{parsed.scheme}://{host}/robots.txt")
+        finally:
+            with self.robots_lock:
+                self.robots[host] = robots if robots is not False else None
+            done.set()
+        if robots is not None:
+            with self.cond:
+                state = self.hosts.get(host)
+                if state is not None:
+                    self.apply_crawl_delay(host, state)
+        return robots
+
+    def read_robots(self, url):
+        # Same rules as RobotFileParser.read(), but with a timeout; None when
+        # robots.txt could not be fetched, in which case everything is allowed
+        try:
+            status, text = self.fetch_robots(url, self.robots_timeout)
+        except Exception:
+            return None
+        robots = RobotFileParser(url)
+        if status in (401, 403):
+            robots.disallow_all = True
+        elif 400 <= status < 500:
+            robots.allow_all = True
+        elif 200 <= status < 300:
+            robots.parse(text.splitlines())
+        else:
+            return None
+        return robots
+
+    def apply_crawl_delay(self, host, state):
+        robots = self.robots.get(host)
+        if not isinstance(robots, RobotFileParser):
+            return
+        crawl_delay = robots.crawl_delay(self.user_agent)
+        if crawl_delay is None:
+            rate = robots.request_rate(self.user_agent)
+            if rate is not None and rate.requests:
+                crawl_delay = rate.seconds / rate.requests
+        if crawl_delay:
+            state.crawl_delay = float(crawl_delay)
+            state.delay = max(state.delay, state.crawl_delay)
+
+    def qsize(self):
+        return self.size
+
+    def empty(self):
+        return self.size == 0
+
+
+def fetch_robots_txt(url, timeout):
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            return response.status, response.read().decode('utf-8', errors='replace')
+    except HTTPError as e:
+        return e.code, ''
+
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
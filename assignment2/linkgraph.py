@@ -0,0 +1,131 @@
+import glob
+import os
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# The crawl's link graph, stored compactly enough for multi-million-edge crawls:
+#   <root>.nodes   one URL per line; line n (from 0) is the URL with ID n
+#   <root>.edges   (source ID, target ID) pairs as native-endian uint32s
+# Edge files are append-only, so a checkpoint offset is simply a byte count.
+NODE_SUFFIX = '.nodes'
+EDGE_SUFFIX = '.edges'
+EDGE_BYTES = 8
+
+ID_TYPE = 'I' if array('I').itemsize == 4 else 'L'
+
+
+# A BatchedWriter sink taking rows of [page URL, out-link URLs]. URLs are
+# interned here, on the writer thread, so crawl workers never touch the table.
+class EdgeSink:
+    def __init__(self, path_root, offset=None):
+        self.path = path_root + EDGE_SUFFIX
+        self.nodes_path = path_root + NODE_SUFFIX
+        self.ids = {}
+        if offset is None:
+            self.nodes = open(self.nodes_path, 'w', encoding='utf-8', newline='\n')
+            self.edges = open(self.path, 'wb')
+        else:
+            self.nodes = self.reload_nodes()
+            # Drop edges written after the checkpoint; those pages are fetched again
+            self.edges = open(self.path, 'r+b')
+            self.edges.truncate(offset - offset % EDGE_BYTES)
+            self.edges.seek(0, os.SEEK_END)
+        self.count = self.edges.tell() // EDGE_BYTES
+
+    def reload_nodes(self):
+        # Every node is kept, even ones first seen after the checkpoint, so
+        # IDs stay the same; only a torn last line is cut off
+        with open(self.nodes_path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for url in data[:end].decode('utf-8').splitlines():
+            self.ids[url] = len(self.ids)
+        nodes = open(self.nodes_path, 'r+', encoding='utf-8', newline='\n')
+        nodes.truncate(end)
+        nodes.seek(end)
+        return nodes
+
+    def intern(self, url, new):
+        node = self.ids.get(url)
+        if node is None:
+            node = self.ids[url] = len(self.ids)
+            new.append(url)
+        return node
+
+    def write(self, rows):
+        pairs = array(ID_TYPE)
+        new = []
+        for url, links in rows:
+            source = self.intern(url, new)
+            for link in links:
+                pairs.append(source)
+                pairs.append(self.intern(link, new))
+        # Nodes first, so an edge on disk never refers to an unwritten URL
+        if new:
+            self.nodes.write('\n'.join(new) + '\n')
+            self.nodes.flush()
+        pairs.tofile(self.edges)
+        self.count += len(pairs) // 2
+
+    def flush(self):
+        self.nodes.flush()
+        self.edges.flush()
+        return self.edges.tell()
+
+    def close(self):
+        self.nodes.close()
+        self.edges.close()
+
+
+def graph_files(path_root):
+    # links_x or, for a sharded crawl, links_x.shard0, links_x.shard1, ...
+    if os.path.exists(path_root + EDGE_SUFFIX):
+        return [path_root]
+    shards = sorted(glob.glob(f'{path_root}.shard*{EDGE_SUFFIX}'))
+    return [path[:-len(EDGE_SUFFIX)] for path in shards]
+
+
+def read_nodes(path_root):
+    with open(path_root + NODE_SUFFIX, 'rb') as f:
+        data = f.read()
+    return data[:data.rfind(b'\n') + 1].decode('utf-8').splitlines()
+
+
+def load_graph(path_root):
+    # Returns (URLs, source IDs, target IDs) with IDs indexing the URL list.
+    # Shards number their nodes independently, so their IDs are remapped into
+    # one table; a single file is used as is.
+    if np is None:
+        raise ImportError("Loading the link graph requires numpy (pip install numpy)")
+    roots = graph_files(path_root)
+    if not roots:
+        raise FileNotFoundError(f"No link graph at {path_root}{EDGE_SUFFIX}")
+
+    urls = []
+    ids = {}
+    sources = []
+    targets = []
+    for root in roots:
+        nodes = read_nodes(root)
+        edges = np.fromfile(root + EDGE_SUFFIX, dtype=np.uint32)
+        edges = edges[:len(edges) - len(edges) % 2].reshape(-1, 2)
+        if len(roots) == 1:
+            urls = nodes
+            sources.append(edges[:, 0])
+            targets.append(edges[:, 1])
+            break
+        remap = np.empty(len(nodes), dtype=np.uint32)
+        for local, url in enumerate(nodes):
+            node = ids.get(url)
+            if node is None:
+                node = ids[url] = len(urls)
+                urls.append(url)
+            remap[local] = node
+        sources.append(remap[edges[:, 0]])
+        targets.append(remap[edges[:, 1]])
+    return urls, np.concatenate(sources), np.concatenate(targets)
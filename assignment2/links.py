@@ -0,0 +1,77 @@
+import io
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+# Out-link extraction backends. Every backend returns the absolute URL of each
+# <a href> in document order (duplicates included, empty hrefs skipped), which
+# is what the crawler writes to urls_latimes.csv.
+
+def links_bs4(html, base_url):
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []
+    for link in soup.find_all('a'):
+        href = link.get('href')
+        if href:
+            links.append(urljoin(base_url, href))
+    return links
+
+
+# BeautifulSoup's html.parser builder runs this same tokenizer, so listening for
+# <a> start tags directly gives the same hrefs without building a DOM
+class HrefParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = None
+            # BeautifulSoup keeps the last value of a repeated attribute
+            for name, value in attrs:
+                if name == 'href':
+                    href = value
+            if href:
+                self.hrefs.append(href)
+
+    handle_startendtag = handle_starttag
+
+
+def links_stream(html, base_url):
+    parser = HrefParser()
+    parser.feed(html)
+    parser.close()
+    return [urljoin(base_url, href) for href in parser.hrefs]
+
+
+def links_lxml(html, base_url):
+    if etree is None:
+        raise ImportError("the lxml link parser requires lxml (pip install lxml)")
+    links = []
+    source = io.BytesIO(html.encode('utf-8'))
+    for _, element in etree.iterparse(source, events=('start',), tag='a', html=True,
+                                      encoding='utf-8', recover=True):
+        href = element.get('href')
+        if href:
+            links.append(urljoin(base_url, href))
+        element.clear()
+    return links
+
+
+LINK_PARSERS = {
+    'bs4': links_bs4,
+    'stream': links_stream,
+    'lxml': links_lxml,
+}
+
+
+# Module level so it can be shipped to a ProcessPoolExecutor
+def extract_links(html, base_url, parser='bs4'):
+    return LINK_PARSERS[parser](html, base_url)
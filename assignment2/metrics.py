@@ -0,0 +1,228 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float('inf')
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in items) + '}'
+
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+# In-process crawl metrics: labelled counters and histograms updated by the
+# workers, and gauges read from the crawler only when somebody looks. Workers
+# hold the lock for a dict update, never for I/O.
+class Metrics:
+    def __init__(self, prefix='crawler'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.help = {}
+        self.started = time.time()
+
+    def describe(self, name, kind, help_text):
+        self.help[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def gauge(self, name, read, help_text=''):
+        # read() is called at scrape time
+        self.gauges[name] = read
+        self.describe(name, 'gauge', help_text)
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        described = set()
+
+        def header(name, default_kind):
+            if name not in described:
+                described.add(name)
+                kind, help_text = self.help.get(name, (default_kind, ''))
+                if help_text:
+                    lines.append(f'# HELP {self.prefix}_{name} {help_text}')
+                lines.append(f'# TYPE {self.prefix}_{name} {kind}')
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.cumulative()), h.sum, h.count) for key, h in histograms]
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{self.prefix}_{name}{format_labels(labels)} {value}')
+        for (name, labels), buckets, total, count in histograms:
+            header(name, 'histogram')
+            for bound, cumulative in buckets:
+                lines.append(f'{self.prefix}_{name}_bucket{format_labels(labels, le=format_bound(bound))} {cumulative}')
+            lines.append(f'{self.prefix}_{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{self.prefix}_{name}_count{format_labels(labels)} {count}')
+        for name, read in sorted(self.gauges.items()):
+            header(name, 'gauge')
+            lines.append(f'{self.prefix}_{name} {read()}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        # The same numbers as a JSON-friendly dict, with p50/p99 per histogram
+        with self.lock:
+            counters = [(name, dict(labels), value) for (name, labels), value in self.counters.items()]
+            histograms = [(name, dict(labels), h.count, h.sum, h.quantile(0.5), h.quantile(0.99))
+                          for (name, labels), h in self.histograms.items()]
+        snapshot = {'time': time.time(), 'uptime': time.time() - self.started,
+                    'counters': {}, 'histograms': {}, 'gauges': {}}
+        for name, labels, value in counters:
+            snapshot['counters'].setdefault(name, []).append({'labels': labels, 'value': value})
+        for name, labels, count, total, p50, p99 in histograms:
+            snapshot['histograms'].setdefault(name, []).append(
+                {'labels': labels, 'count': count, 'sum': total, 'p50': p50, 'p99': p99})
+        for name, read in self.gauges.items():
+            snapshot['gauges'][name] = read()
+        return snapshot
+
+
+def write_json(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, default=str)
+    os.replace(tmp, path)
+
+
+def serve_metrics(metrics, port, host='127.0.0.1'):
+    # /metrics in Prometheus text format, /metrics.json as a snapshot
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/metrics.json'):
+                body = json.dumps(metrics.snapshot(), default=str).encode('utf-8')
+                content_type = 'application/json'
+            elif self.path.startswith('/metrics'):
+                body = metrics.render().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+class SnapshotWriter:
+    # Rewrites a JSON snapshot every `interval` seconds, and once more on stop()
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='metrics-snapshot', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            write_json(self.path, self.metrics.snapshot())
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        write_json(self.path, self.metrics.snapshot())
+
+
+# Samples the stack of every other thread at a fixed interval and writes the
+# counts in folded-stack format ("outer;inner;leaf count"), which flamegraph.pl
+# and speedscope read directly. Costs one frame walk per thread per sample.
+class SamplingProfiler:
+    def __init__(self, path, interval=0.005):
+        self.path = path
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='sampling-profiler', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self.stopped.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)).split('_')[0])
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
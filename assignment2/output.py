@@ -0,0 +1,191 @@
+import atexit
+import csv
+import gzip
+import threading
+import time
+from queue import Queue, Empty
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+EXTENSIONS = {'csv': '.csv', 'gzip': '.csv.gz', 'parquet': '.parquet'}
+
+
+class CsvSink:
+    def __init__(self, path, header, offset=None, compress=False):
+        self.path = path
+        if compress:
+            if offset is not None:
+                raise ValueError("Compressed output cannot be resumed from a checkpoint")
+            self.file = gzip.open(path, 'wt', newline='', encoding='utf-8')
+        elif offset is None:
+            self.file = open(path, 'w', newline='', encoding='utf-8')
+        else:
+            # Drop rows written after the checkpoint; those pages are fetched again
+            self.file = open(path, 'r+', newline='', encoding='utf-8')
+            self.file.truncate(offset)
+            self.file.seek(offset)
+        self.writer = csv.writer(self.file)
+        if offset is None:
+            self.writer.writerow(header)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def flush(self):
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    def __init__(self, path, header, offset=None):
+        if pq is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        if offset is not None:
+            raise ValueError("Parquet output cannot be resumed from a checkpoint")
+        self.path = path
+        self.header = header
+        # Every column is a string: Status holds both codes and 'FAILED'
+        self.schema = pa.schema([(name, pa.string()) for name in header])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        self.rows = 0
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(pa.table(
+            {name: [str(value) for value in column] for name, column in zip(self.header, columns)},
+            schema=self.schema))
+        self.rows += len(rows)
+
+    def flush(self):
+        return self.rows
+
+    def close(self):
+        self.writer.close()
+
+
+# All crawl output goes through one writer thread. Workers hand over rows with
+# write() and never wait on file I/O; the thread batches rows per file and
+# writes every `batch_size` rows or `interval` seconds, whichever comes first.
+# If a sink raises, the thread stops and flush() and close() raise its error.
+class BatchedWriter:
+    def __init__(self, fmt='csv', batch_size=1000, interval=1.0):
+        if fmt not in EXTENSIONS:
+            raise ValueError(f"Unknown output format '{fmt}', expected one of {', '.join(EXTENSIONS)}")
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.interval = interval
+        self.sinks = {}
+        self.pending = {}
+        self.queue = Queue()
+        self.closed = False
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name='output-writer', daemon=True)
+        self.thread.start()
+        # Rows still queued when the interpreter exits are written, not lost
+        atexit.register(self.close)
+
+    def open(self, name, path_root, header, offsets=None):
+        # offsets (from a checkpoint) maps file path to the position to resume at
+        path = path_root + EXTENSIONS[self.fmt]
+        offset = None if offsets is None else offsets.get(path)
+        if self.fmt == 'parquet':
+            sink = ParquetSink(path, header, offset)
+        else:
+            sink = CsvSink(path, header, offset, compress=self.fmt == 'gzip')
+        self.sinks[name] = sink
+        self.pending[name] = []
+        return sink
+
+    def attach(self, name, sink):
+        # A sink with its own file format, batched and flushed like the rest
+        self.sinks[name] = sink
+        self.pending[name] = []
+        return sink
+
+    def write(self, name, rows):
+        self.queue.put((name, rows))
+
+    def flush(self):
+        # Blocks until every row written so far is on disk; returns {path: offset}
+        done = threading.Event()
+        offsets = {}
+        self.queue.put((None, (done, offsets)))
+        self.wait(done)
+        return offsets
+
+    def wait(self, done):
+        # `done` is set by the writer thread, or by its error handler; a flush
+        # queued after the thread died would never be
+        while not self.error and not done.wait(1.0):
+            if not self.thread.is_alive():
+                break
+        if self.error:
+            raise self.error
+
+    def run(self):
+        try:
+            self.write_loop()
+        except Exception as e:
+            self.error = e
+            # Release every flush() already waiting; later ones see the dead thread
+            while True:
+                try:
+                    name, rows = self.queue.get_nowait()
+                except Empty:
+                    return
+                if name is None and rows is not None:
+                    rows[0].set()
+
+    def write_loop(self):
+        buffered = 0
+        last_write = time.monotonic()
+        while True:
+            try:
+                name, rows = self.queue.get(timeout=self.interval)
+            except Empty:
+                name, rows = '', []
+
+            if name is None:
+                self.write_pending()
+                buffered = 0
+                if rows is None:  # close()
+                    return
+                done, offsets = rows
+                for sink in self.sinks.values():
+                    offsets[sink.path] = sink.flush()
+                done.set()
+                continue
+
+            if rows:
+                self.pending[name].extend(rows)
+                buffered += len(rows)
+            now = time.monotonic()
+            if buffered >= self.batch_size or (buffered and now - last_write >= self.interval):
+                self.write_pending()
+                buffered = 0
+                last_write = now
+
+    def write_pending(self):
+        for name, rows in self.pending.items():
+            if rows:
+                self.sinks[name].write(rows)
+                self.pending[name] = []
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put((None, None))
+        self.thread.join()
+        for sink in self.sinks.values():
+            sink.close()
+        if self.error:
+            raise self.error
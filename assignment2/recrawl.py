@@ -0,0 +1,167 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+
+TAG_RE = re.compile(r'<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->|<[^>]+>', re.S | re.I)
+WORD_RE = re.compile(r'\w+')
+
+
+def content_hash(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def simhash(html, shingle=3):
+    # 64-bit SimHash over word shingles of the page's visible text. Pages that
+    # differ only in a few words end up a few bits apart.
+    words = WORD_RE.findall(TAG_RE.sub(' ', html).lower())
+    features = {' '.join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))}
+    counts = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+        for bit in range(64):
+            if h >> bit & 1:
+                counts[bit] += 1
+    half = len(features) / 2
+    value = 0
+    for bit, count in enumerate(counts):
+        if count > half:
+            value |= 1 << bit
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class PageRecord:
+    __slots__ = ('etag', 'last_modified', 'hash', 'simhash', 'size', 'content_type', 'links')
+
+    def __init__(self, etag, last_modified, hash, simhash, size, content_type, links):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.hash = hash
+        self.simhash = simhash
+        self.size = size
+        self.content_type = content_type
+        self.links = links
+
+
+# What the previous crawl saw for every URL: validators for conditional
+# requests, a body hash, a SimHash for near-duplicate detection, and the
+# out-links, so unchanged pages can be replayed without parsing them again.
+class RecrawlStore:
+    def __init__(self, path, max_distance=3):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.max_distance = max_distance
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS pages ("
+                              "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, hash TEXT, "
+                              "simhash INTEGER, size INTEGER, content_type TEXT, links BLOB, fetched REAL)")
+        # SimHashes split into four 16-bit bands: two hashes within 3 bits of
+        # each other must agree exactly on at least one band. Each band maps
+        # url -> simhash, and `simhashes` holds every URL's current one, so a
+        # refetched page replaces its old entries instead of adding more.
+        self.bands = defaultdict(dict)
+        self.simhashes = {}
+        for url, value in self.conn.execute("SELECT url, simhash FROM pages WHERE simhash IS NOT NULL"):
+            self.index(url, value)
+
+        self.not_modified = 0
+        self.unchanged = 0
+        self.near_duplicates = 0
+        self.bytes_saved = 0
+
+    def index(self, url, value):
+        # value=None only drops the URL's old entries
+        old = self.simhashes.pop(url, None)
+        if old is not None:
+            for band in range(4):
+                key = (band, old >> (16 * band) & 0xFFFF)
+                del self.bands[key][url]
+                if not self.bands[key]:
+                    del self.bands[key]
+        if value is not None:
+            self.simhashes[url] = value
+            for band in range(4):
+                self.bands[(band, value >> (16 * band) & 0xFFFF)][url] = value
+
+    def lookup(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT etag, last_modified, hash, simhash, size, content_type, links "
+                                    "FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, hash, value, size, content_type, links = row
+        if links is not None:
+            links = zlib.decompress(links).decode('utf-8')
+            links = links.split('\n') if links else []
+        return PageRecord(etag, last_modified, hash, value, size, content_type, links)
+
+    def request_headers(self, url):
+        record = self.lookup(url)
+        headers = {}
+        if record is not None:
+            if record.etag:
+                headers['If-None-Match'] = record.etag
+            if record.last_modified:
+                headers['If-Modified-Since'] = record.last_modified
+        return headers
+
+    def record_not_modified(self, url):
+        # Returns the stored record for a 304 response
+        record = self.lookup(url)
+        if record is not None:
+            with self.lock:
+                self.not_modified += 1
+                self.bytes_saved += record.size or 0
+        return record
+
+    def unchanged_links(self, url, body):
+        # Stored out-links if the body is byte-identical to last time, else None
+        record = self.lookup(url)
+        if record is None or record.links is None or record.hash != content_hash(body):
+            return None
+        with self.lock:
+            self.unchanged += 1
+        return record.links
+
+    def touch(self, url, headers):
+        # Refresh the validators of a page whose body did not change
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE pages SET etag = ?, last_modified = ?, fetched = ? WHERE url = ?",
+                              (headers.get('ETag'), headers.get('Last-Modified'), time.time(), url))
+
+    def near_duplicate(self, url, value):
+        # Another URL whose text is within max_distance bits of this one
+        mask = (1 << 64) - 1
+        for band in range(4):
+            for other_url, other in self.bands.get((band, value >> (16 * band) & 0xFFFF), {}).items():
+                if other_url != url and bin((value ^ other) & mask).count('1') <= self.max_distance:
+                    return other_url
+        return None
+
+    def remember(self, url, headers, body, content_type, text=None, links=None):
+        # Returns the URL this page nearly duplicates, if any
+        value = simhash(text) if text is not None else None
+        duplicate_of = None
+        with self.lock:
+            if value is not None:
+                duplicate_of = self.near_duplicate(url, value)
+                if duplicate_of:
+                    self.near_duplicates += 1
+            self.index(url, value)
+            packed = zlib.compress('\n'.join(links).encode('utf-8')) if links is not None else None
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (url, headers.get('ETag'), headers.get('Last-Modified'), content_hash(body),
+                                   value, len(body), content_type, packed, time.time()))
+        return duplicate_of
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,28 +1,86 @@
+import argparse
 import csv
+import glob
+import gzip
+import os
 from collections import defaultdict
 from urllib.parse import urlparse
 
-def read_csv(filename):
-    with open(filename, 'r', encoding='utf-8') as f:
-        return list(csv.reader(f))
+from hll import HyperLogLog
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+def shard_files(filename):
+    # A sharded crawl writes fetch_x.shard0.csv, fetch_x.shard1.csv, ... instead of
+    # fetch_x.csv; --output-format gzip adds a .gz to each name and parquet
+    # replaces the .csv with .parquet
+    root, ext = os.path.splitext(filename)
+    names = (ext, ext + '.gz', '.parquet')
+    for name in names:
+        if os.path.exists(root + name):
+            return [root + name]
+    for name in names:
+        shards = sorted(glob.glob(f'{root}.shard*{name}'))
+        if shards:
+            return shards
+    return [filename]
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+def iter_parquet(path):
+    if pq is None:
+        raise ImportError(f"Reading {path} requires pyarrow (pip install pyarrow)")
+    # Every column was written as a string, so rows match the CSV ones
+    for batch in pq.ParquetFile(path).iter_batches():
+        yield from zip(*(column.to_pylist() for column in batch.columns))
+
+def iter_rows(filename):
+    # Yields data rows one at a time, across shards, without the header rows
+    for path in shard_files(filename):
+        if path.endswith('.parquet'):
+            yield from map(list, iter_parquet(path))
+            continue
+        with open_text(path) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            yield from reader
 
 def get_domain(url):
-    return urlparse(url).netloc
-
-def process_fetch_csv(fetch_data):
-    attempted = len(fetch_data) - 1  # Subtract 1 to account for header
-    succeeded = sum(1 for row in fetch_data[1:] if row[1].startswith('2'))
-    failed_or_aborted = attempted - succeeded
+    # Cheaper than urlparse for the usual scheme://host/... form
+    scheme_end = url.find('://')
+    if scheme_end < 0:
+        return urlparse(url).netloc
+    start = scheme_end + 3
+    end = len(url)
+    for sep in '/?#':
+        i = url.find(sep, start)
+        if i >= 0 and i < end:
+            end = i
+    return url[start:end]
+
+def process_fetch_csv(fetch_rows):
+    attempted = 0
+    succeeded = 0
     status_codes = defaultdict(int)
-    for row in fetch_data[1:]:  # Skip header row
+    for row in fetch_rows:
+        attempted += 1
+        if row[1].startswith('2'):
+            succeeded += 1
         status_codes[row[1]] += 1
+    failed_or_aborted = attempted - succeeded
     return attempted, succeeded, failed_or_aborted, status_codes
 
-def process_visit_csv(visit_data):
+def process_visit_csv(visit_rows):
     file_sizes = defaultdict(int)
     content_types = defaultdict(int)
     total_urls = 0
-    for row in visit_data[1:]:  # Skip header row
+    for row in visit_rows:
         size = int(row[1])
         total_urls += int(row[2])
         content_types[row[3]] += 1
@@ -38,12 +96,20 @@ def process_visit_csv(visit_data):
             file_sizes['>= 1MB'] += 1
     return file_sizes, content_types, total_urls
 
-def process_urls_csv(urls_data, news_site):
-    unique_urls = set()
-    unique_within = set()
-    unique_outside = set()
-    for row in urls_data[1:]:  # Skip header row
+def process_urls_csv(urls_rows, news_site, approx=False):
+    # Exact counts keep every unique URL in a set; approx uses three fixed-size
+    # HyperLogLog sketches instead, at ~1% error
+    if approx:
+        unique_urls, unique_within, unique_outside = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    else:
+        unique_urls, unique_within, unique_outside = set(), set(), set()
+    last_url = None
+    for row in urls_rows:
         url = row[0]
+        # The same link often repeats on consecutive rows of one page
+        if url == last_url:
+            continue
+        last_url = url
         unique_urls.add(url)
         if news_site in get_domain(url):
             unique_within.add(url)
@@ -93,16 +159,20 @@ Content Types:
     return report
 
 def main():
-    news_site = input("Enter the news site name (e.g., nytimes): ")
-    num_threads = int(input("Enter the number of threads used: "))
-
-    fetch_data = read_csv(f'fetch_{news_site}.csv')
-    visit_data = read_csv(f'visit_{news_site}.csv')
-    urls_data = read_csv(f'urls_{news_site}.csv')
-
-    fetch_stats = process_fetch_csv(fetch_data)
-    visit_stats = process_visit_csv(visit_data)
-    urls_stats = process_urls_csv(urls_data, news_site)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('news_site', nargs='?')
+    parser.add_argument('num_threads', nargs='?', type=int)
+    parser.add_argument('--approx', action='store_true',
+                        help="estimate unique URL counts with HyperLogLog instead of exact sets")
+    args = parser.parse_args()
+
+    news_site = args.news_site or input("Enter the news site name (e.g., nytimes): ")
+    num_threads = args.num_threads or int(input("Enter the number of threads used: "))
+
+    # Each file is streamed once; only the unique-URL counts can grow with input size
+    fetch_stats = process_fetch_csv(iter_rows(f'fetch_{news_site}.csv'))
+    visit_stats = process_visit_csv(iter_rows(f'visit_{news_site}.csv'))
+    urls_stats = process_urls_csv(iter_rows(f'urls_{news_site}.csv'), news_site, approx=args.approx)
 
     report = generate_report(news_site, num_threads, fetch_stats, visit_stats, urls_stats)
 
@@ -0,0 +1,232 @@
+import argparse
+import heapq
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from itertools import groupby
+from multiprocessing import Pool
+
+
+# Builds unigram_index.txt and bigram_index.txt on one machine, in the same
+# "term<TAB>doc:count doc:count ..." format as UnigramIndexer / BigramIndexer,
+# from the same input: lines of "doc ID<TAB>text".
+#
+#   python indexer.py data/                        # every file under data/
+#   python indexer.py new_docs.txt --update        # add or replace documents
+#   python indexer.py data/ --all-bigrams --workers 8
+#
+# Inputs are cut into chunks at line boundaries. Each worker tokenizes one
+# chunk and writes it out as sorted runs of (term, doc, count), so no process
+# holds more than a chunk's postings; the runs are then combined with a k-way
+# merge that streams straight into the index file.
+
+TOKEN_SPLIT = re.compile(r'[^a-zA-Z\s]', re.ASCII)
+
+# The bigrams BigramIndexer looks for
+TARGET_BIGRAMS = ("computer science", "information retrieval", "power politics", "los angeles", "bruce willis")
+
+MERGE_FAN_IN = 64
+
+
+def tokenize(text):
+    # Same rule as the Hadoop mappers: lowercase, anything but letters and
+    # whitespace becomes a space, split on whitespace
+    return TOKEN_SPLIT.sub(' ', text.lower()).split()
+
+
+def find_chunks(paths, chunk_size):
+    # (path, start, end) byte ranges; each one starts at the beginning of a
+    # line and ends just after a newline or at the end of the file
+    chunks = []
+    for path in paths:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            start = 0
+            while start < size:
+                f.seek(min(start + chunk_size, size))
+                f.readline()
+                end = min(f.tell(), size)
+                chunks.append((path, start, end))
+                start = end
+    return chunks
+
+
+def write_run(path, counts):
+    # One "term<TAB>doc<TAB>count" line per posting, sorted by term then doc
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for (term, doc), count in sorted(counts.items()):
+            f.write(f'{term}\t{doc}\t{count}\n')
+
+
+def index_chunk(task):
+    # Runs in a worker: returns (unigram run, bigram run, doc IDs seen)
+    (path, start, end), run_root, bigrams = task
+    unigrams = Counter()
+    pairs = Counter()
+    docs = set()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # Lines end at \n or \r\n only, as in Hadoop's TextInputFormat;
+    # splitlines() would also break on form feeds and other separators
+    for line in data.decode('utf-8', errors='replace').split('\n'):
+        doc, tab, text = line.removesuffix('\r').partition('\t')
+        if not tab:
+            continue
+        docs.add(doc)
+        words = tokenize(text)
+        for word, count in Counter(words).items():
+            unigrams[word, doc] += count
+        for bigram in map(' '.join, zip(words, words[1:])):
+            if bigrams is None or bigram in bigrams:
+                pairs[bigram, doc] += 1
+    write_run(run_root + '.uni', unigrams)
+    write_run(run_root + '.bi', pairs)
+    return run_root + '.uni', run_root + '.bi', docs
+
+
+def read_run(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            term, doc, count = line.rstrip('\n').split('\t')
+            yield term, doc, int(count)
+
+
+def read_index(path, skip_docs=()):
+    # Postings of an existing index file as (term, doc, count), in file order
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            term, tab, postings = line.rstrip('\r\n').partition('\t')
+            if not tab:
+                continue
+            for item in postings.split():
+                doc, _, count = item.rpartition(':')
+                if doc not in skip_docs:
+                    yield term, doc, int(count)
+
+
+def index_to_runs(path, run_root, skip_docs, run_size=1000000):
+    # An earlier index need not be sorted (Hadoop writes one part file per
+    # reducer), so it is cut into sorted runs like any other input
+    runs = []
+    counts = Counter()
+    for term, doc, count in read_index(path, skip_docs):
+        counts[term, doc] += count
+        if len(counts) >= run_size:
+            runs.append(f'{run_root}{len(runs):05d}')
+            write_run(runs[-1], counts)
+            counts = Counter()
+    if counts or not runs:
+        runs.append(f'{run_root}{len(runs):05d}')
+        write_run(runs[-1], counts)
+    return runs
+
+
+def merged_postings(runs):
+    # Streams (term, doc, count) in sorted order, summing duplicates
+    merged = heapq.merge(*(read_run(path) for path in runs), key=lambda posting: posting[:2])
+    for (term, doc), group in groupby(merged, key=lambda posting: posting[:2]):
+        yield term, doc, sum(count for _, _, count in group)
+
+
+def merge_runs(runs, work_dir, fan_in=MERGE_FAN_IN):
+    # Merges in passes of at most fan_in files, so open files stay bounded
+    level = 0
+    while len(runs) > fan_in:
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            path = os.path.join(work_dir, f'merge{level}-{i // fan_in:05d}')
+            with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                for term, doc, count in merged_postings(runs[i:i + fan_in]):
+                    f.write(f'{term}\t{doc}\t{count}\n')
+            merged.append(path)
+        for path in runs:
+            os.remove(path)
+        runs = merged
+        level += 1
+    return merged_postings(runs)
+
+
+def write_index(postings, path):
+    # One line per term; written to a temporary file and renamed into place
+    tmp = path + '.tmp'
+    terms = 0
+    with open(tmp, 'w', encoding='utf-8', newline='\n') as f:
+        for term, group in groupby(postings, key=lambda posting: posting[0]):
+            f.write(term + '\t' + ' '.join(f'{doc}:{count}' for _, doc, count in group) + '\n')
+            terms += 1
+    os.replace(tmp, path)
+    return terms
+
+
+def input_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith('.'))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def build(paths, unigram_path, bigram_path, bigrams=TARGET_BIGRAMS, workers=None, chunk_size=16 * 2 ** 20,
+          update=False):
+    # bigrams=None indexes every adjacent pair. With update=True the existing
+    # index files are merged in, minus any document that appears in the new
+    # input, so re-sent documents replace their old postings.
+    # Returns (documents indexed, unigram terms, bigram terms).
+    out_dir = os.path.dirname(os.path.abspath(unigram_path))
+    work_dir = tempfile.mkdtemp(prefix='index-runs-', dir=out_dir)
+    try:
+        chunks = find_chunks(input_files(paths), chunk_size)
+        targets = frozenset(bigrams) if bigrams is not None else None
+        tasks = [(chunk, os.path.join(work_dir, f'chunk{i:05d}'), targets) for i, chunk in enumerate(chunks)]
+        unigram_runs = []
+        bigram_runs = []
+        docs = set()
+        with Pool(workers) as pool:
+            for unigram_run, bigram_run, chunk_docs in pool.imap_unordered(index_chunk, tasks):
+                unigram_runs.append(unigram_run)
+                bigram_runs.append(bigram_run)
+                docs |= chunk_docs
+
+        if update:
+            for runs, path, name in ((unigram_runs, unigram_path, 'old-uni'), (bigram_runs, bigram_path, 'old-bi')):
+                if os.path.exists(path):
+                    runs.extend(index_to_runs(path, os.path.join(work_dir, name), docs))
+
+        unigram_terms = write_index(merge_runs(unigram_runs, work_dir), unigram_path)
+        bigram_terms = write_index(merge_runs(bigram_runs, work_dir), bigram_path)
+        return len(docs), unigram_terms, bigram_terms
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Build the unigram and bigram inverted indexes without Hadoop")
+    parser.add_argument('inputs', nargs='+', help="files or directories of 'doc ID<TAB>text' lines")
+    parser.add_argument('--unigram', default=os.path.join(here, 'unigram_index.txt'))
+    parser.add_argument('--bigram', default=os.path.join(here, 'bigram_index.txt'))
+    parser.add_argument('--bigrams', nargs='+', default=list(TARGET_BIGRAMS), help="bigrams to index")
+    parser.add_argument('--all-bigrams', action='store_true', help="index every adjacent word pair")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--chunk-mb', type=float, default=16.0, help="input per task, in MB")
+    parser.add_argument('--update', action='store_true',
+                        help="merge into the existing indexes; documents in the input replace their old postings")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    docs, unigram_terms, bigram_terms = build(
+        args.inputs, args.unigram, args.bigram, bigrams=None if args.all_bigrams else [' '.join(tokenize(bigram)) for bigram in args.bigrams],
+        workers=args.workers, chunk_size=int(args.chunk_mb * 2 ** 20), update=args.update)
+    print(f"Indexed {docs} documents in {time.perf_counter() - start:.2f}s: "
+          f"{unigram_terms} unigrams in {args.unigram}, {bigram_terms} bigrams in {args.bigram}")
+
+
+if __name__ == "__main__":
+    main()
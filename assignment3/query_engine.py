@@ -0,0 +1,329 @@
+import argparse
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from indexer import tokenize
+
+
+# Queries over the indexes written by UnigramIndexer / BigramIndexer
+# ("term<TAB>doc:count doc:count ..."). The text index is converted once to a
+# binary file next to it, which is memory-mapped; a query decodes only the
+# postings of its own terms.
+#
+#   python query_engine.py --mode bm25 "los angeles lakers"
+#   python query_engine.py --mode and "computer science"
+#   python query_engine.py --mode phrase "information retrieval"
+#   python query_engine.py --mode or < queries.txt      # one query per line
+#
+# Binary layout (little-endian; every section starts on an 8-byte boundary):
+#   header      magic, version, term count, doc count, then the offset of each section
+#   terms       term offsets (uint64, one more than terms) + UTF-8 blob, sorted by bytes
+#   dfs         document frequency per term (uint32)
+#   postings    posting offsets (uint64, one more than terms) + blob; per term, varint
+#               pairs of (gap from the previous doc number, count), doc numbers ascending
+#   docs        doc ID offsets (uint64, one more than docs) + blob, doc numbers in order
+#   lengths     tokens per doc (uint32), from the postings themselves
+
+MAGIC = b'QIX1'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ8Q')
+SECTIONS = ('term_offsets', 'terms', 'dfs', 'posting_offsets', 'postings', 'doc_offsets', 'docs', 'lengths')
+
+def encode_varints(values):
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+    return out
+
+
+def decode_varints(data):
+    # Vectorized: each value ends at a byte below 0x80
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shift = 7 * (np.arange(len(data)) - np.repeat(starts, ends - starts + 1))
+    parts = (data & 0x7f).astype(np.int64) << shift
+    return np.add.reduceat(parts, starts)
+
+
+def doc_sort_key(doc):
+    # Numeric IDs in numeric order, anything else after them
+    return (0, int(doc), '') if doc.isdigit() else (1, 0, doc)
+
+
+def parse_postings(text):
+    for item in text.split():
+        doc, _, count = item.rpartition(':')
+        yield doc, int(count)
+
+
+def build_index(text_path, bin_path):
+    # Two passes over the text index, so only doc IDs and term offsets are
+    # held in memory: the first numbers the docs, the second encodes postings
+    # in sorted term order
+    lengths = {}
+    entries = []
+    with open(text_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            term, _, postings = line.decode('utf-8').rstrip('\r\n').partition('\t')
+            if term and postings:
+                entries.append((term.encode('utf-8'), offset))
+                for doc, count in parse_postings(postings):
+                    lengths[doc] = lengths.get(doc, 0) + count
+            offset += len(line)
+    docs = sorted(lengths, key=doc_sort_key)
+    doc_number = {doc: i for i, doc in enumerate(docs)}
+    entries.sort()
+
+    term_blob = bytearray()
+    term_offsets = [0]
+    dfs = []
+    posting_blob = bytearray()
+    posting_offsets = [0]
+    with open(text_path, 'rb') as f:
+        for term, offset in entries:
+            f.seek(offset)
+            counts = {}
+            for doc, count in parse_postings(f.readline().decode('utf-8').partition('\t')[2]):
+                number = doc_number[doc]
+                counts[number] = counts.get(number, 0) + count
+            previous = 0
+            values = []
+            for number in sorted(counts):
+                values.append(number - previous)
+                values.append(counts[number])
+                previous = number
+            term_blob += term
+            term_offsets.append(len(term_blob))
+            dfs.append(len(counts))
+            posting_blob += encode_varints(values)
+            posting_offsets.append(len(posting_blob))
+
+    doc_blob = bytearray()
+    doc_offsets = [0]
+    for doc in docs:
+        doc_blob += doc.encode('utf-8')
+        doc_offsets.append(len(doc_blob))
+
+    sections = [
+        np.array(term_offsets, dtype='<u8').tobytes(), bytes(term_blob),
+        np.array(dfs, dtype='<u4').tobytes(),
+        np.array(posting_offsets, dtype='<u8').tobytes(), bytes(posting_blob),
+        np.array(doc_offsets, dtype='<u8').tobytes(), bytes(doc_blob),
+        np.array([lengths[doc] for doc in docs], dtype='<u4').tobytes(),
+    ]
+    tmp = bin_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        position = HEADER.size
+        starts = []
+        body = bytearray()
+        for section in sections:
+            pad = -position % 8
+            body += b'\0' * pad
+            position += pad
+            starts.append(position)
+            body += section
+            position += len(section)
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), len(docs), *starts))
+        f.write(body)
+    os.replace(tmp, bin_path)
+    return len(entries), len(docs)
+
+
+class BinaryIndex:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.num_terms, self.num_docs, *starts = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} binary index")
+        starts = dict(zip(SECTIONS, starts))
+
+        # Views into the mapping; nothing is copied
+        def array(name, dtype, count):
+            return np.frombuffer(self.map, dtype=dtype, count=count, offset=starts[name])
+
+        self.term_offsets = array('term_offsets', '<u8', self.num_terms + 1)
+        self.terms_at = starts['terms']
+        self.dfs = array('dfs', '<u4', self.num_terms)
+        self.posting_offsets = array('posting_offsets', '<u8', self.num_terms + 1)
+        self.postings_at = starts['postings']
+        self.doc_offsets = array('doc_offsets', '<u8', self.num_docs + 1)
+        self.docs_at = starts['docs']
+        self.lengths = array('lengths', '<u4', self.num_docs)
+        self.avg_length = float(self.lengths.mean()) if self.num_docs else 0.0
+
+    def term(self, i):
+        return self.map[self.terms_at + int(self.term_offsets[i]):self.terms_at + int(self.term_offsets[i + 1])]
+
+    def find(self, term):
+        # Binary search over the sorted term dictionary; -1 if absent
+        key = term.encode('utf-8')
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.num_terms and self.term(lo) == key else -1
+
+    def postings(self, term):
+        # Returns (doc numbers, counts), both int64 arrays, doc numbers ascending
+        i = self.find(term)
+        if i < 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        start = self.postings_at + int(self.posting_offsets[i])
+        values = decode_varints(self.map[start:self.postings_at + int(self.posting_offsets[i + 1])])
+        return np.cumsum(values[0::2]), values[1::2]
+
+    def doc_id(self, number):
+        return self.map[self.docs_at + int(self.doc_offsets[number]):
+                        self.docs_at + int(self.doc_offsets[number + 1])].decode('utf-8')
+
+
+def open_index(text_path):
+    # The binary index lives next to the text one and is rebuilt when stale
+    bin_path = os.path.splitext(text_path)[0] + '.bin'
+    if not os.path.exists(bin_path) or os.path.getmtime(bin_path) < os.path.getmtime(text_path):
+        start = time.perf_counter()
+        terms, docs = build_index(text_path, bin_path)
+        print(f"Built {bin_path}: {terms} terms, {docs} docs in {time.perf_counter() - start:.2f}s",
+              file=sys.stderr)
+    return BinaryIndex(bin_path)
+
+
+class QueryEngine:
+    def __init__(self, unigrams, bigrams=None, k1=1.2, b=0.75):
+        self.unigrams = unigrams
+        self.bigrams = bigrams
+        self.k1 = k1
+        self.b = b
+
+    def docs(self, numbers, index=None):
+        index = index or self.unigrams
+        return [index.doc_id(int(number)) for number in numbers]
+
+    def boolean_and(self, terms):
+        result = None
+        # Rarest term first keeps the intersections small
+        for term in sorted(set(terms), key=lambda term: self.df(term)):
+            numbers, _ = self.unigrams.postings(term)
+            result = numbers if result is None else np.intersect1d(result, numbers, assume_unique=True)
+            if not len(result):
+                break
+        return self.docs(result if result is not None else [])
+
+    def boolean_or(self, terms):
+        numbers = [self.unigrams.postings(term)[0] for term in set(terms)]
+        return self.docs(np.unique(np.concatenate(numbers)) if numbers else [])
+
+    def df(self, term):
+        i = self.unigrams.find(term)
+        return int(self.unigrams.dfs[i]) if i >= 0 else 0
+
+    def phrase(self, terms):
+        # Returns (doc IDs, exact). The indexes keep counts, not positions, so
+        # a phrase matches docs holding each of its adjacent pairs as a bigram.
+        # Pairs missing from the bigram index fall back to a plain AND, which
+        # is reported as inexact.
+        if len(terms) < 2:
+            return self.boolean_and(terms), True
+        if self.bigrams is not None:
+            result = None
+            for first, second in zip(terms, terms[1:]):
+                if self.bigrams.find(f'{first} {second}') < 0:
+                    break
+                docs = set(self.docs(self.bigrams.postings(f'{first} {second}')[0], self.bigrams))
+                result = docs if result is None else result & docs
+            else:
+                return sorted(result, key=doc_sort_key), True
+        return self.boolean_and(terms), False
+
+    def rank(self, terms, k=10, scoring='bm25'):
+        # Returns [(doc ID, score)] for the k best docs, best first
+        index = self.unigrams
+        n = index.num_docs
+        scores = np.zeros(n)
+        for term in set(terms):
+            numbers, counts = index.postings(term)
+            if not len(numbers):
+                continue
+            df = len(numbers)
+            tf = counts.astype(np.float64) * terms.count(term)
+            if scoring == 'bm25':
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * index.lengths[numbers] / index.avg_length)
+                scores[numbers] += idf * tf * (self.k1 + 1) / (tf + norm)
+            else:
+                # Smoothed idf: a term in every document still counts a little,
+                # so a query made only of such terms ranks something
+                scores[numbers] += (1 + np.log(tf)) * math.log(1 + n / df)
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [(index.doc_id(int(number)), float(scores[number])) for number in hits]
+
+    def run(self, mode, query, k=10):
+        terms = tokenize(query)
+        if mode == 'and':
+            return self.boolean_and(terms), None
+        if mode == 'or':
+            return self.boolean_or(terms), None
+        if mode == 'phrase':
+            docs, exact = self.phrase(terms)
+            return docs, None if exact else "no bigram postings for every word pair; matched as AND"
+        return self.rank(terms, k, mode), None
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Query the unigram and bigram inverted indexes")
+    parser.add_argument('queries', nargs='*', help="queries to run; one per line from stdin if none are given")
+    parser.add_argument('--mode', choices=['and', 'or', 'phrase', 'bm25', 'tfidf'], default='bm25')
+    parser.add_argument('--unigram', default=os.path.join(here, 'unigram_index.txt'))
+    parser.add_argument('--bigram', default=os.path.join(here, 'bigram_index.txt'))
+    parser.add_argument('--top', type=int, default=10, help="results per ranked query")
+    parser.add_argument('--k1', type=float, default=1.2)
+    parser.add_argument('--b', type=float, default=0.75)
+    parser.add_argument('--repeat', type=int, default=1, help="run each query this many times for latency")
+    args = parser.parse_args()
+
+    bigrams = open_index(args.bigram) if args.bigram and os.path.exists(args.bigram) else None
+    engine = QueryEngine(open_index(args.unigram), bigrams, k1=args.k1, b=args.b)
+    queries = args.queries or [line.strip() for line in sys.stdin if line.strip()]
+
+    latencies = []
+    for query in queries:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results, note = engine.run(args.mode, query, args.top)
+            latencies.append(time.perf_counter() - start)
+        print(f"{query!r}: {len(results)} results in {1000 * latencies[-1]:.3f} ms")
+        if note:
+            print(f"  ({note})")
+        for result in results[:args.top]:
+            print(f"  {result[0]}  {result[1]:.4f}" if isinstance(result, tuple) else f"  {result}")
+
+    if latencies:
+        latencies.sort()
+        print(f"\n{len(latencies)} queries: mean {1000 * sum(latencies) / len(latencies):.3f} ms, "
+              f"p50 {1000 * latencies[len(latencies) // 2]:.3f} ms, "
+              f"p99 {1000 * latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
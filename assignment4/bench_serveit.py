@@ -0,0 +1,123 @@
+import argparse
+import glob
+import http.client
+import os
+import random
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+from urllib.parse import quote
+
+# Throughput of serveit.py's default (no-store) mode against --fast, serving
+# this directory's PDFs and images to concurrent clients.
+#
+#   python bench_serveit.py
+#   python bench_serveit.py --clients 32 --requests 200
+#
+# Scenarios:
+#   full        every request downloads a whole file
+#   revalidate  clients send back the ETag they got (a browser re-opening the PDF)
+#   range       64 KB byte ranges at random offsets (a PDF viewer paging through)
+# The default mode sends no ETag and ignores Range, so it answers every
+# request with the whole file.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVEIT = os.path.join(HERE, 'serveit.py')
+SCENARIOS = ('full', 'revalidate', 'range')
+
+
+def client(task):
+    # One keep-alive connection per client, reopened when the server closes it
+    port, paths, sizes, scenario, requests, seed = task
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    etags = {}
+    latencies = []
+    received = 0
+    for i in range(requests):
+        path = paths[i % len(paths)]
+        headers = {}
+        if scenario == 'revalidate' and path in etags:
+            headers['If-None-Match'] = etags[path]
+        elif scenario == 'range':
+            start = rng.randrange(max(sizes[path] - 65536, 1))
+            headers['Range'] = f'bytes={start}-{start + 65535}'
+        start = time.perf_counter()
+        connection.request('GET', '/' + quote(path), headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        latencies.append(time.perf_counter() - start)
+        received += len(body)
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+        if response.will_close:
+            connection.close()
+    connection.close()
+    return latencies, received
+
+
+def run(port, paths, sizes, scenario, clients, requests):
+    tasks = [(port, paths, sizes, scenario, requests, seed) for seed in range(clients)]
+    with Pool(clients) as pool:
+        start = time.perf_counter()
+        results = pool.map(client, tasks)
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for result in results for latency in result[0])
+    received = sum(result[1] for result in results)
+    return {
+        'requests_per_sec': len(latencies) / elapsed,
+        'mb_per_sec': received / elapsed / 2 ** 20,
+        'p50_ms': 1000 * latencies[len(latencies) // 2],
+        'p99_ms': 1000 * latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+def start_server(port, fast, directory):
+    command = [sys.executable, SERVEIT, str(port), '--bind', '127.0.0.1', '--directory', directory]
+    if fast:
+        command.append('--fast')
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            http.client.HTTPConnection('127.0.0.1', port, timeout=1).connect()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError(f"serveit.py did not start on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serveit.py's default and --fast modes")
+    parser.add_argument('--directory', default=HERE)
+    parser.add_argument('--files', nargs='+', help="files to fetch (default: every .pdf and .png in the directory)")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help="requests per client per scenario")
+    parser.add_argument('--port', type=int, default=8700)
+    args = parser.parse_args()
+
+    paths = args.files or sorted(os.path.relpath(path, args.directory)
+                                 for pattern in ('*.pdf', '*.png')
+                                 for path in glob.glob(os.path.join(args.directory, pattern)))
+    paths = [path.replace(os.sep, '/') for path in paths]
+    sizes = {path: os.path.getsize(os.path.join(args.directory, path)) for path in paths}
+    print(f"{len(paths)} files, {sum(sizes.values()) / 2 ** 20:.1f} MB in total; "
+          f"{args.clients} clients x {args.requests} requests per scenario")
+    print(f"{'mode':<8} {'scenario':<11} {'req/s':>9} {'MB/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for port, fast in ((args.port, False), (args.port + 1, True)):
+        server = start_server(port, fast, args.directory)
+        try:
+            for scenario in SCENARIOS:
+                result = run(port, paths, sizes, scenario, args.clients, args.requests)
+                print(f"{'fast' if fast else 'default':<8} {scenario:<11} {result['requests_per_sec']:>9.1f} "
+                      f"{result['mb_per_sec']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}", flush=True)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
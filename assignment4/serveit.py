@@ -1,4 +1,10 @@
+import argparse
+import email.utils
 import http.server
+import os
+import re
+import urllib.parse
+from http import HTTPStatus
 
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
@@ -11,11 +17,145 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header("Expires", "0")
 
 
+RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+# --fast mode: keep-alive connections, file bodies sent with sendfile (no
+# copies through Python), Range requests, and ETag revalidation. "no-cache"
+# still makes clients check with us on every use, but an unchanged file is
+# answered with a 304 instead of being downloaded again.
+class FastHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_head(self):
+        self.remaining = None
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            # A directory's index.html is served like any other file; the
+            # trailing-slash redirect and listings are left to the parent
+            if not urllib.parse.urlsplit(self.path).path.endswith('/'):
+                return super().send_head()
+            for index in ('index.html', 'index.htm'):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                return super().send_head()
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            etag = f'"{st.st_mtime_ns:x}-{size:x}"'
+
+            if etag in self.etags(self.headers.get('If-None-Match')):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_validators(etag, st)
+                self.end_headers()
+                f.close()
+                return None
+
+            start, end = 0, size - 1
+            status = HTTPStatus.OK
+            requested = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            if requested and (if_range is None or if_range == etag):
+                byte_range = self.parse_range(requested, size)
+                if byte_range == 'unsatisfiable':
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    f.close()
+                    return None
+                if byte_range:
+                    start, end = byte_range
+                    status = HTTPStatus.PARTIAL_CONTENT
+
+            self.send_response(status)
+            self.send_header('Content-Type', self.guess_type(path))
+            self.send_header('Content-Length', str(end - start + 1))
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.send_validators(etag, st)
+            self.end_headers()
+            f.seek(start)
+            self.remaining = end - start + 1
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def send_validators(self, etag, st):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', email.utils.formatdate(st.st_mtime, usegmt=True))
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Accept-Ranges', 'bytes')
+
+    @staticmethod
+    def etags(header):
+        if not header:
+            return ()
+        # Weak and strong forms match the same file
+        return [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+    @staticmethod
+    def parse_range(header, size):
+        # Returns (start, end), None to send the whole file (several ranges or
+        # a header we do not understand), or 'unsatisfiable'
+        match = RANGE.match(header.strip())
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first:
+            if not last:
+                return None
+            # The final `last` bytes
+            if int(last) == 0:
+                return 'unsatisfiable'
+            return max(size - int(last), 0), size - 1
+        start = int(first)
+        if start >= size:
+            return 'unsatisfiable'
+        end = min(int(last), size - 1) if last else size - 1
+        return (start, end) if start <= end else None
+
+    def copyfile(self, source, outputfile):
+        if self.remaining is None:
+            # A directory listing, already in memory
+            return super().copyfile(source, outputfile)
+        # socket.sendfile uses os.sendfile where available
+        self.connection.sendfile(source, source.tell(), self.remaining)
+
+
+class FastHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
 if __name__ == '__main__':
-    http.server.test(HandlerClass=MyHTTPRequestHandler)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('port', type=int, nargs='?', default=8000)
+    parser.add_argument('--bind')
+    parser.add_argument('--directory', default=os.getcwd())
+    parser.add_argument('--fast', action='store_true',
+                        help="sendfile, Range and ETag revalidation instead of no-store")
+    args = parser.parse_args()
+
+    if args.fast:
+        handler = lambda *a, **kw: FastHTTPRequestHandler(*a, directory=args.directory, **kw)
+        http.server.test(HandlerClass=handler, ServerClass=FastHTTPServer, port=args.port, bind=args.bind)
+    else:
+        handler = lambda *a, **kw: MyHTTPRequestHandler(*a, directory=args.directory, **kw)
+        http.server.test(HandlerClass=handler, port=args.port, bind=args.bind)
 
 # from https://stackoverflow.com/questions/12193803/invoke-python-simplehttpserver-from-command-line-with-no-cache-option
 # usage: python serveit.py :) GREAT, because it does NOT cache files!! Serves out of port 8000.
+# python serveit.py --fast       # concurrent, zero-copy, revalidating instead of re-downloading
+# python bench_serveit.py        # compares the two modes
 
 # for a diff port, I can just do
 # python -m http.server 8888 [for ex] on the conda prompt...
\ No newline at end of file
@@ -0,0 +1,347 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import requests
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Python version of weave-doQuery.sh, with caching and a local index.
+#
+#   python weave-doQuery.py "drift aggressive bass racing"                  # nearText on Weaviate
+#   python weave-doQuery.py --export phonk_vectors.npz                      # save PhonkMusic vectors
+#   python weave-doQuery.py "dark cowbell" --local phonk_vectors.npz        # top-k in process
+#   python weave-doQuery.py "dark cowbell" --local data.json --vectorizer hashing   # fully offline
+#   python weave-doQuery.py "drift aggressive bass racing" --compare --repeat 20
+#
+# Query embeddings and result sets are kept in LRU caches with a TTL, so a
+# repeated query skips the t2v-transformers call (and, for remote queries,
+# Weaviate itself). Remote queries send the cached embedding as nearVector
+# while t2v-transformers is reachable on --t2v-url (published as port 9090 in
+# docker-compose.yml), and fall back to nearText otherwise. Local search needs
+# query vectors from the same model as the indexed ones: t2v for exported
+# Weaviate vectors, or the hashing vectorizer for an index embedded offline.
+
+PROPERTIES = ['title', 'artist', 'subgenre', 'characteristics']
+
+
+class TTLCache:
+    # Least recently used entries go first once maxsize is reached; entries
+    # older than ttl seconds are treated as missing
+    def __init__(self, maxsize=1024, ttl=600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+# Vectorizers turn text into a unit-length float32 vector.
+
+class T2VVectorizer:
+    # The same model Weaviate uses, through the t2v-transformers port that
+    # docker-compose.yml publishes
+    def __init__(self, url='http://localhost:9090', timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, text):
+        response = self.session.post(f'{self.url}/vectors', json={'text': text}, timeout=self.timeout)
+        response.raise_for_status()
+        return normalize(np.asarray(response.json()['vector'], dtype=np.float32))
+
+
+class HashingVectorizer:
+    # Offline stand-in: words and character trigrams hashed into `dim` signed
+    # buckets. Only comparable with vectors it produced itself.
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def __call__(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = re.findall(r'[a-z0-9]+', text.lower())
+        features = words + [f'#{word[i:i + 3]}' for word in words for i in range(max(len(word) - 2, 1))]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return normalize(vector)
+
+
+class CachedVectorizer:
+    def __init__(self, vectorizer, cache):
+        self.vectorizer = vectorizer
+        self.cache = cache
+
+    def __call__(self, text):
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.vectorizer(text)
+            self.cache.put(text, vector)
+        return vector
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+# Indexes return [(row, cosine distance)] for the k nearest rows, as Weaviate
+# reports distance for its default cosine metric.
+
+class BruteForceIndex:
+    def __init__(self, vectors):
+        self.vectors = normalize(np.asarray(vectors, dtype=np.float32))
+
+    def search(self, query, k):
+        similarity = self.vectors @ query
+        k = min(k, len(similarity))
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top], kind='stable')]
+        return [(int(row), float(1 - similarity[row])) for row in top]
+
+
+class HNSWIndex:
+    def __init__(self, vectors, ef=64, m=16):
+        if hnswlib is None:
+            raise ImportError("The HNSW index requires hnswlib (pip install hnswlib)")
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        self.index = hnswlib.Index(space='cosine', dim=vectors.shape[1])
+        self.index.init_index(max_elements=len(vectors), ef_construction=max(ef, 100), M=m)
+        self.index.add_items(vectors, np.arange(len(vectors)))
+        self.index.set_ef(ef)
+        self.size = len(vectors)
+
+    def search(self, query, k):
+        rows, distances = self.index.knn_query(query, k=min(k, self.size))
+        return [(int(row), float(distance)) for row, distance in zip(rows[0], distances[0])]
+
+
+INDEXES = {'brute': BruteForceIndex, 'hnsw': HNSWIndex}
+
+
+class RemoteSearch:
+    # With a vectorizer (a cached t2v one: Weaviate's vectors come from the
+    # same model), near_text() embeds the concept here and sends nearVector
+    def __init__(self, url='http://localhost:8080', class_name='PhonkMusic', properties=PROPERTIES, timeout=30,
+                 vectorizer=None):
+        self.url = url.rstrip('/')
+        self.class_name = class_name
+        self.properties = properties
+        self.timeout = timeout
+        self.vectorizer = vectorizer
+        self.session = requests.Session()
+
+    def query(self, search, k):
+        fields = ' '.join(self.properties)
+        graphql = (f'{{ Get {{ {self.class_name}(limit: {k} {search}) '
+                   f'{{ {fields} _additional {{ distance }} }} }} }}')
+        response = self.session.post(f'{self.url}/v1/graphql', json={'query': graphql}, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get('errors'):
+            raise RuntimeError(data['errors'][0].get('message'))
+        results = []
+        for item in data['data']['Get'][self.class_name]:
+            distance = item.pop('_additional', {}).get('distance')
+            results.append((item, distance))
+        return results
+
+    def near_text(self, concept, k):
+        if self.vectorizer is not None:
+            try:
+                vector = self.vectorizer(concept)
+            except requests.RequestException:
+                # t2v-transformers is not reachable; stop trying for this run
+                self.vectorizer = None
+            else:
+                return self.near_vector(vector, k)
+        # Weaviate vectorizes the concept itself
+        return self.query(f'nearText: {{concepts: [{json.dumps(concept)}]}}', k)
+
+    def near_vector(self, vector, k):
+        # Skips Weaviate's own call to the vectorizer
+        return self.query(f'nearVector: {{vector: {json.dumps([float(x) for x in vector])}}}', k)
+
+
+class LocalSearch:
+    def __init__(self, objects, vectors, vectorizer, index='brute'):
+        self.objects = objects
+        self.vectorizer = vectorizer
+        self.index = INDEXES[index](vectors)
+
+    def near_text(self, concept, k):
+        return [(self.objects[row], distance) for row, distance in self.index.search(self.vectorizer(concept), k)]
+
+
+class QueryClient:
+    # Result sets cached per (backend, concept, k)
+    def __init__(self, search, cache):
+        self.search = search
+        self.cache = cache
+
+    def near_text(self, concept, k=3):
+        key = (id(self.search), concept, k)
+        results = self.cache.get(key)
+        if results is None:
+            results = self.search.near_text(concept, k)
+            self.cache.put(key, results)
+        return results
+
+
+def export_vectors(url, class_name, path, page=100, properties=PROPERTIES):
+    # Pages through /v1/objects with the `after` cursor; returns the object count
+    session = requests.Session()
+    objects = []
+    vectors = []
+    after = None
+    while True:
+        params = {'class': class_name, 'include': 'vector', 'limit': page}
+        if after:
+            params['after'] = after
+        response = session.get(f'{url.rstrip("/")}/v1/objects', params=params, timeout=60)
+        response.raise_for_status()
+        batch = response.json().get('objects', [])
+        if not batch:
+            break
+        for item in batch:
+            objects.append({name: item['properties'].get(name) for name in properties})
+            vectors.append(item['vector'])
+        after = batch[-1]['id']
+    np.savez(path, vectors=np.asarray(vectors, dtype=np.float32), objects=json.dumps(objects))
+    return len(objects)
+
+
+def load_local(path, vectorizer, index, query_vectorizer=None):
+    # An export from export_vectors(), or records (data.json) embedded here.
+    # Queries go through query_vectorizer (the cached one) when given.
+    query_vectorizer = query_vectorizer or vectorizer
+    if path.endswith('.npz'):
+        data = np.load(path)
+        return LocalSearch(json.loads(str(data['objects'])), data['vectors'], query_vectorizer, index)
+    with open(path, encoding='utf-8') as f:
+        records = json.load(f)
+    objects = [{key[:1].lower() + key[1:]: value for key, value in record.items()} for record in records]
+    vectors = np.stack([vectorizer(' '.join(str(value) for value in obj.values())) for obj in objects])
+    return LocalSearch(objects, vectors, query_vectorizer, index)
+
+
+def timed(call, repeat):
+    # Returns (result, [seconds per call])
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        latencies.append(time.perf_counter() - start)
+    return result, latencies
+
+
+def print_results(results):
+    for obj, distance in results:
+        shown = f'{distance:.4f}' if distance is not None else '-'
+        print(f"  {shown}  {obj.get('title')} by {obj.get('artist')} ({obj.get('subgenre')})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query PhonkMusic remotely or from a local vector index")
+    parser.add_argument('concepts', nargs='*', default=["drift aggressive bass racing"])
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--class', dest='class_name', default='PhonkMusic')
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--local', metavar='PATH', help="search in process over an .npz export or a JSON record file")
+    parser.add_argument('--export', metavar='PATH', help="save every object and vector of the class to PATH (.npz)")
+    parser.add_argument('--vectorizer', choices=['t2v', 'hashing'], default='t2v')
+    parser.add_argument('--t2v-url', default='http://localhost:9090')
+    parser.add_argument('--index', choices=list(INDEXES), default='brute')
+    parser.add_argument('--cache-size', type=int, default=1024)
+    parser.add_argument('--ttl', type=float, default=600.0, help="seconds before cached entries expire")
+    parser.add_argument('--compare', action='store_true',
+                        help="time remote nearText, remote nearVector and local search, each cold and cached")
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.export:
+        count = export_vectors(args.url, args.class_name, args.export)
+        print(f"Exported {count} {args.class_name} objects to {args.export}")
+        return
+
+    vectorizer = T2VVectorizer(args.t2v_url) if args.vectorizer == 't2v' else HashingVectorizer()
+    embeddings = TTLCache(args.cache_size, args.ttl)
+    embed = CachedVectorizer(vectorizer, embeddings)
+    results_cache = TTLCache(args.cache_size, args.ttl)
+
+    if not args.compare:
+        if args.local:
+            search = load_local(args.local, vectorizer, args.index, embed)
+        else:
+            # Hashing vectors are not in Weaviate's space, so only t2v ones are sent
+            search = RemoteSearch(args.url, args.class_name, vectorizer=embed if args.vectorizer == 't2v' else None)
+        client = QueryClient(search, results_cache)
+        for concept in args.concepts:
+            results, latencies = timed(lambda: client.near_text(concept, args.k), args.repeat)
+            print(f"{concept!r}: first {1000 * latencies[0]:.2f} ms"
+                  + (f", then {1000 * np.mean(latencies[1:]):.3f} ms cached" if len(latencies) > 1 else ""))
+            print_results(results)
+        return
+
+    # "cold" skips both caches; "cached" is the same query again through them
+    remote = RemoteSearch(args.url, args.class_name)
+    remote_client = QueryClient(remote, results_cache)
+    paths = [('remote nearText', lambda c: remote.near_text(c, args.k), lambda c: remote_client.near_text(c, args.k))]
+    if args.vectorizer == 't2v':
+        # Still a Weaviate round trip, but without its call to the vectorizer
+        paths.append(('remote nearVector', lambda c: remote.near_vector(vectorizer(c), args.k),
+                      lambda c: remote.near_vector(embed(c), args.k)))
+    if args.local:
+        local = load_local(args.local, vectorizer, args.index, embed)
+        local_client = QueryClient(local, results_cache)
+        paths.append((f'local {args.index}', lambda c: local.index.search(vectorizer(c), args.k),
+                      lambda c: local_client.near_text(c, args.k)))
+
+    print(f"{'path':<20} {'cold ms':>10} {'cached ms':>10}")
+    for name, cold, cached in paths:
+        try:
+            _, cold_latencies = timed(lambda: [cold(c) for c in args.concepts], args.repeat)
+            for concept in args.concepts:
+                cached(concept)
+            _, cached_latencies = timed(lambda: [cached(c) for c in args.concepts], args.repeat)
+        except (requests.RequestException, RuntimeError) as e:
+            print(f"{name:<20} unavailable ({e.__class__.__name__})")
+            continue
+        per_query = 1000 / len(args.concepts)
+        print(f"{name:<20} {per_query * np.mean(cold_latencies):>10.3f} {per_query * np.mean(cached_latencies):>10.3f}")
+    print(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses; "
+          f"result cache: {results_cache.hits} hits, {results_cache.misses} misses")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,30 @@
+import argparse
+import csv
 import json
-from weaviate import Client
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from queue import Queue
 
-# Create client using v3 syntax
-client = Client(
-    url="http://localhost:8080"
-)
+import requests
 
-# First, let's check if the class already exists and delete it if it does
-try:
-    client.schema.delete_class("PhonkMusic")
-except Exception:
-    pass  # Class didn't exist, which is fine
+# Bulk loader for the PhonkMusic class (or any other).
+#
+#   python weave-loadData.py                           # data.json, as before
+#   python weave-loadData.py tracks.jsonl --workers 8
+#   python weave-loadData.py tracks.csv --key title --class Tracks
+#   python weave-loadData.py big.jsonl --backend stub  # no Weaviate needed
+#
+# Records are streamed from JSONL or CSV (a .json array is read whole), so the
+# input can be any size. Batches go to several worker threads at once, and the
+# batch size follows the observed latency. Every object gets a UUID derived
+# from its key fields, so re-running the loader updates objects in place
+# instead of duplicating them, and the class is no longer dropped first.
 
-# Create the class
-class_obj = {
-    "class": "PhonkMusic",
-    "vectorizer": "text2vec-transformers"
-}
-
-client.schema.create_class(class_obj)
-
-# Phonk music data
+# Phonk music data, written to data.json when there is no input file yet
 phonk_data = [
     {
         "Title": "MURDER IN MY MIND",
@@ -114,31 +118,260 @@ phonk_data = [
     }
 ]
 
-# Save to data.json
-with open('data.json', 'w') as f:
-    json.dump(phonk_data, f, indent=2)
 
-print("Reading data.json...")
-with open('data.json', 'r') as f:
-    data = json.load(f)
+# Batches are written through Weaviate's REST batch endpoint rather than the
+# client's batch context, which is not meant to be shared between threads.
+# An object sent again with the same id replaces the stored one.
+class WeaviateBackend:
+    def __init__(self, url, class_name, vectorizer='text2vec-transformers', timeout=60):
+        self.url = url.rstrip('/')
+        self.class_name = class_name
+        self.vectorizer = vectorizer
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def ensure_class(self, recreate=False):
+        session = self.session()
+        exists = session.get(f'{self.url}/v1/schema/{self.class_name}', timeout=self.timeout).status_code == 200
+        if exists and recreate:
+            session.delete(f'{self.url}/v1/schema/{self.class_name}', timeout=self.timeout).raise_for_status()
+            exists = False
+        if not exists:
+            session.post(f'{self.url}/v1/schema', timeout=self.timeout,
+                         json={'class': self.class_name, 'vectorizer': self.vectorizer}).raise_for_status()
+
+    def upsert(self, objects):
+        # objects: [(uuid, properties)]. Returns {uuid: error} for the ones that
+        # failed; raises if the whole request did.
+        body = {'objects': [{'class': self.class_name, 'id': object_id, 'properties': properties}
+                            for object_id, properties in objects]}
+        response = self.session().post(f'{self.url}/v1/batch/objects', json=body, timeout=self.timeout)
+        response.raise_for_status()
+        failed = {}
+        for result in response.json():
+            errors = (result.get('result') or {}).get('errors')
+            if errors:
+                failed[result['id']] = '; '.join(error.get('message', '') for error in errors.get('error', []))
+        return failed
+
+
+# Stands in for Weaviate when testing the loader: keeps objects in a dict,
+# takes longer for bigger batches, and fails a share of objects and requests.
+class StubBackend:
+    def __init__(self, latency=0.02, per_object=0.0005, object_error_rate=0.01, request_error_rate=0.02, seed=0):
+        self.objects = {}
+        self.latency = latency
+        self.per_object = per_object
+        self.object_error_rate = object_error_rate
+        self.request_error_rate = request_error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def ensure_class(self, recreate=False):
+        if recreate:
+            self.objects.clear()
+
+    def upsert(self, objects):
+        time.sleep(self.latency + self.per_object * len(objects))
+        with self.lock:
+            if self.rng.random() < self.request_error_rate:
+                raise requests.ConnectionError("stub: connection reset")
+            failed = {}
+            for object_id, properties in objects:
+                if self.rng.random() < self.object_error_rate:
+                    failed[object_id] = "stub: object rejected"
+                else:
+                    self.objects[object_id] = properties
+            return failed
+
+
+def iter_records(path):
+    if path == '-' or path.endswith(('.jsonl', '.ndjson')):
+        f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def to_properties(record):
+    # "Title" -> "title", "Release Year" -> "releaseYear"
+    properties = {}
+    for key, value in record.items():
+        words = key.split()
+        name = words[0][:1].lower() + words[0][1:] + ''.join(word[:1].upper() + word[1:] for word in words[1:])
+        properties[name] = value
+    return properties
+
+
+def object_uuid(class_name, properties, key_fields):
+    key = json.dumps([class_name] + [properties.get(field) for field in key_fields], ensure_ascii=False)
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+# Grows the batch while requests come back well under the target latency and
+# halves it when they take too long. Shared by all workers.
+class BatchSizer:
+    def __init__(self, initial=100, minimum=10, maximum=2000, target_latency=1.0):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target_latency
+        self.lock = threading.Lock()
+
+    def observe(self, size, latency):
+        with self.lock:
+            if latency > self.target:
+                self.size = max(self.minimum, int(self.size / 2))
+            elif latency < self.target / 2 and size >= self.size:
+                self.size = min(self.maximum, int(self.size * 1.5) + 1)
+
+
+class Loader:
+    def __init__(self, backend, class_name, key_fields, workers=4, sizer=None, max_retries=5, backoff=0.5,
+                 failed_path=None, report_every=5.0):
+        self.backend = backend
+        self.class_name = class_name
+        self.key_fields = key_fields
+        self.workers = workers
+        self.sizer = sizer or BatchSizer()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.failed_path = failed_path
+        self.report_every = report_every
+        # Bounded, so reading never runs far ahead of the workers
+        self.batches = Queue(maxsize=workers * 2)
+        self.lock = threading.Lock()
+        self.loaded = 0
+        self.retried = 0
+        self.failed = []
+        self.skipped = 0
+
+    def load(self, records):
+        threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self.start = time.perf_counter()
+        last_report = self.start
+
+        batch = {}
+        for record in records:
+            properties = to_properties(record)
+            if any(properties.get(field) in (None, '') for field in self.key_fields):
+                self.skipped += 1
+                continue
+            # The same key twice in one batch would race with itself
+            batch[object_uuid(self.class_name, properties, self.key_fields)] = properties
+            if len(batch) >= self.sizer.size:
+                self.batches.put(list(batch.items()))
+                batch = {}
+            now = time.perf_counter()
+            if now - last_report >= self.report_every:
+                self.report(now)
+                last_report = now
+        if batch:
+            self.batches.put(list(batch.items()))
+        for _ in threads:
+            self.batches.put(None)
+        for thread in threads:
+            thread.join()
+
+        if self.failed and self.failed_path:
+            with open(self.failed_path, 'w', encoding='utf-8') as f:
+                for object_id, properties, error in self.failed:
+                    f.write(json.dumps({'id': object_id, 'properties': properties, 'error': error}) + '\n')
+        return time.perf_counter() - self.start
+
+    def worker(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            self.send(batch)
+
+    def send(self, batch):
+        # Resends whatever failed, the whole batch after a request error or
+        # just the rejected objects, with exponential backoff
+        pending = batch
+        errors = {}
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self.lock:
+                    self.retried += len(pending)
+                time.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            start = time.perf_counter()
+            try:
+                errors = self.backend.upsert(pending)
+            except requests.RequestException as e:
+                errors = {object_id: str(e) for object_id, _ in pending}
+            else:
+                self.sizer.observe(len(pending), time.perf_counter() - start)
+            done = len(pending) - len(errors)
+            with self.lock:
+                self.loaded += done
+            pending = [(object_id, properties) for object_id, properties in pending if object_id in errors]
+            if not pending:
+                return
+        with self.lock:
+            self.failed.extend((object_id, properties, errors[object_id]) for object_id, properties in pending)
+
+    def report(self, now):
+        elapsed = now - self.start
+        print(f"{self.loaded} objects loaded, {self.loaded / elapsed:.0f} objects/s, batch size {self.sizer.size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream records into a Weaviate class")
+    parser.add_argument('input', nargs='?', default='data.json', help="JSONL, CSV or JSON array file ('-' for JSONL on stdin)")
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--class', dest='class_name', default='PhonkMusic')
+    parser.add_argument('--key', nargs='+', default=['title', 'artist'],
+                        help="properties that identify an object; its UUID is derived from them")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=100, help="initial batch size")
+    parser.add_argument('--min-batch', type=int, default=10)
+    parser.add_argument('--max-batch', type=int, default=2000)
+    parser.add_argument('--target-latency', type=float, default=1.0, help="seconds per batch request to aim for")
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--failed', default='failed_objects.jsonl', help="where objects that kept failing are written")
+    parser.add_argument('--recreate', action='store_true', help="drop and recreate the class first")
+    parser.add_argument('--backend', choices=['weaviate', 'stub'], default='weaviate')
+    args = parser.parse_args()
+
+    if args.input == 'data.json' and not os.path.exists(args.input):
+        with open(args.input, 'w') as f:
+            json.dump(phonk_data, f, indent=2)
 
-print(f"Importing {len(data)} records...")
+    if args.backend == 'stub':
+        backend = StubBackend()
+    else:
+        backend = WeaviateBackend(args.url, args.class_name)
+    backend.ensure_class(recreate=args.recreate)
 
-# Import data using batch
-with client.batch as batch:
-    batch.batch_size = 100
+    sizer = BatchSizer(args.batch_size, args.min_batch, args.max_batch, args.target_latency)
+    loader = Loader(backend, args.class_name, args.key, workers=args.workers, sizer=sizer,
+                    max_retries=args.retries, failed_path=args.failed)
+    print(f"Importing {args.input} into {args.class_name}...")
+    elapsed = loader.load(iter_records(args.input))
 
-    for i, d in enumerate(data):
-        print(f"\nimporting datum: {i}")
+    print(f"Loaded {loader.loaded} objects in {elapsed:.2f}s ({loader.loaded / elapsed:.0f} objects/s), "
+          f"final batch size {sizer.size}, {loader.retried} resends")
+    if loader.skipped:
+        print(f"Skipped {loader.skipped} records missing a key field ({', '.join(args.key)})")
+    if loader.failed:
+        print(f"{len(loader.failed)} objects failed after {args.retries} retries; see {args.failed}")
 
-        properties = {
-            "title": d["Title"],
-            "artist": d["Artist"],
-            "subgenre": d["Subgenre"],
-            "characteristics": d["Characteristics"]
-        }
 
-        client.batch.add_data_object(
-            properties,
-            "PhonkMusic"
-        )
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,138 @@
+import threading
+import time
+from queue import Queue, Empty
+
 import streamlit as st
 from litellm import completion
 
+# (column title, LiteLLM model name); more can be added from the sidebar
+DEFAULT_MODELS = """llama3 = ollama/llama3
+gemma 2:2b = ollama/gemma2:2b"""
+
+
+def parse_models(text):
+    models = []
+    for line in text.splitlines():
+        if line.strip():
+            title, _, model = line.partition('=')
+            models.append((title.strip(), (model or title).strip()))
+    return models
+
+
+def stream_model(index, model, messages, events, cancel, timeout):
+    # Runs in a worker thread; Streamlit calls stay on the script thread, so
+    # tokens are handed over through the queue
+    response = None
+    try:
+        response = completion(model=model, messages=messages, stream=True, timeout=timeout)
+        for chunk in response:
+            if cancel.is_set():
+                return
+            text = chunk.choices[0].delta.content
+            if text:
+                events.put((index, 'token', text))
+        events.put((index, 'done', None))
+    except Exception as e:
+        events.put((index, 'error', str(e)))
+    finally:
+        close_stream(response)
+
+
+def close_stream(response):
+    # Hanging up is what tells Ollama or the provider to stop generating;
+    # LiteLLM's wrapper closes the underlying stream on close() where it has one
+    for stream in (response, getattr(response, 'completion_stream', None)):
+        close = getattr(stream, 'close', None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+
+def fan_out(models, messages, timeout):
+    # Sends the prompt to every model at once and yields (model index, kind,
+    # payload) as things happen: 'token' with text, then exactly one of 'done',
+    # 'error' (message) or 'timeout'. A model that runs past `timeout` seconds
+    # is cancelled; so is every model still running if the caller stops early.
+    events = Queue()
+    cancels = [threading.Event() for _ in models]
+    for index, (_, model) in enumerate(models):
+        threading.Thread(target=stream_model, args=(index, model, messages, events, cancels[index], timeout),
+                         daemon=True).start()
+    deadline = time.monotonic() + timeout
+    running = set(range(len(models)))
+    try:
+        while running:
+            try:
+                index, kind, payload = events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except Empty:
+                for index in sorted(running):
+                    cancels[index].set()
+                    yield index, 'timeout', None
+                return
+            if index not in running:
+                continue
+            if kind != 'token':
+                running.discard(index)
+            yield index, kind, payload
+    finally:
+        for cancel in cancels:
+            cancel.set()
+
+
 # set up the Streamlit app
 st.title("Multi-LLM prompting")
 
+models = parse_models(st.sidebar.text_area("Models (title = LiteLLM model, one per line):", DEFAULT_MODELS))
+timeout = st.sidebar.slider("Timeout per model (seconds)", 5, 300, 120)
+
 # create a text input for user messages
 user_input = st.text_input("Prompt:")
 
 if st.button("Send"):
-        if user_input:
+        if not models:
+            st.warning("Please add at least one model in the sidebar.")
+        elif user_input:
             messages = [{"role": "user", "content": user_input}]
 
-            # columns for side-by-side display
-            col1, col2 = st.columns(2)
-
-            # first
-            with col1:
-                st.subheader("llama3")
-                try:
-                    response = completion(model="ollama/llama3", messages=messages)
-                    st.write(response.choices[0].message.content)
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-
-            # second
-            with col2:
-                st.subheader("gemma 2:2b")
-                try:
-                    response = completion(model="ollama/gemma2:2b", messages=messages)
-                    st.write(response.choices[0].message.content)
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            # one column per model, all filled in at once as tokens arrive
+            columns = st.columns(len(models))
+            outputs = []
+            stats = []
+            for column, (title, _) in zip(columns, models):
+                with column:
+                    st.subheader(title)
+                    outputs.append(st.empty())
+                    stats.append(st.empty())
+
+            texts = [''] * len(models)
+            first_token = [None] * len(models)
+            start = time.perf_counter()
+            for index, kind, payload in fan_out(models, messages, timeout):
+                elapsed = time.perf_counter() - start
+                if kind == 'token':
+                    if first_token[index] is None:
+                        first_token[index] = elapsed
+                    texts[index] += payload
+                    outputs[index].markdown(texts[index] + " ▌")
+                    continue
+                outputs[index].markdown(texts[index])
+                # Below the answer, so any partial text already shown stays
+                if kind == 'error':
+                    stats[index].error(f"Error: {payload}" + (" (partial answer above)" if texts[index] else ""))
+                    continue
+                if kind == 'timeout':
+                    stats[index].warning(f"Stopped after {timeout}s" + (" (partial answer above)" if texts[index] else ""))
+                    continue
+                ttft = f"{first_token[index]:.2f}s" if first_token[index] is not None else "-"
+                stats[index].caption(f"first token {ttft}, total {elapsed:.2f}s")
+
+            st.caption(f"All models finished in {time.perf_counter() - start:.2f}s")
 
             st.divider()
 
-            st.write("Exercise for later - install two more models from https://ollama.com/library [including https://ollama.com/library/llama2-chinese!], add two more columns above, put in code to send your prompt to FOUR LLMs and display their responses.")
+            st.write("Exercise for later - install two more models from https://ollama.com/library [including https://ollama.com/library/llama2-chinese!], add them in the sidebar, and your prompt goes to all of them at once.")
 
             st.divider()
         else:
@@ -48,4 +146,4 @@ st.sidebar.write("This app, derived from https://github.com/Shubhamsaboo/awesome
 
 st.sidebar.write(
     "Aim - to see how different AI models respond to the same prompt..."
-)
\ No newline at end of file
+)
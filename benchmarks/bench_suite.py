@@ -0,0 +1,167 @@
+import argparse
+import glob
+import os
+import re
+import runpy
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Offline benchmarks: every crawler mode against the same synthetic site on
+# localhost, then the SERP extractors on generated result-page fixtures.
+#
+#   python bench_suite.py                          # defaults: 1000 pages, 20 ms latency
+#   python bench_suite.py --pages 5000 --modes threaded async
+#   python bench_suite.py --skip-serps --latency-ms 0 --error-rate 0
+#
+# Each mode runs in its own process so CPU time and peak RSS are its own;
+# the site is served by another process so its work is not counted. CPU time
+# covers every shard process, but peak RSS is that of the largest single
+# process (ru_maxrss is a maximum, not a sum), so sharded runs use more
+# memory in total than the column shows.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+CRAWLER = os.path.join(ROOT, 'assignment2', 'crawler.py')
+BENCH_SERP = os.path.join(ROOT, 'assignment1', 'bench_serp.py')
+STUB_SITE = os.path.join(HERE, 'stub_site.py')
+
+MODES = {
+    'threaded': ['--threads', '16'],
+    'threaded-lxml': ['--threads', '16', '--parser', 'lxml'],
+    'async': ['--engine', 'async', '--concurrency', '200'],
+    'sharded': ['--shards', '4', '--threads', '8'],
+}
+
+
+def run_child(latency_dir, crawler_args):
+    # Runs crawler.py in this process with every fetch latency logged to
+    # latency_dir, one file of packed doubles per process (shards included)
+    sys.path.insert(0, os.path.dirname(CRAWLER))
+    import frontier
+
+    record = frontier.PoliteFrontier.record
+    files = {}
+
+    def timed_record(self, url, status, latency, retry_after=None):
+        pid = os.getpid()
+        if pid not in files:
+            files[pid] = os.open(os.path.join(latency_dir, f'{pid}.bin'),
+                                 os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+        # Unbuffered, because shard processes end without running atexit hooks
+        os.write(files[pid], struct.pack('d', latency))
+        return record(self, url, status, latency, retry_after)
+
+    frontier.PoliteFrontier.record = timed_record
+    sys.argv = [CRAWLER] + crawler_args
+    runpy.run_path(CRAWLER, run_name='__main__')
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_mode(name, seed_url, max_pages, extra_args):
+    with tempfile.TemporaryDirectory(prefix=f'bench-{name}-') as work:
+        latency_dir = os.path.join(work, 'latency')
+        os.makedirs(latency_dir)
+        args = ['--seed', seed_url, '--max-pages', str(max_pages), '--checkpoint-every', '0'] + extra_args
+        with open(os.path.join(work, 'crawl.log'), 'w') as log:
+            start = time.perf_counter()
+            process = subprocess.Popen([sys.executable, __file__, '--child', latency_dir, '--'] + args,
+                                       cwd=work, stdout=log, stderr=subprocess.STDOUT)
+            # wait4 gives this child's own resource usage, including the shard
+            # processes it waited for
+            _, status, usage = os.wait4(process.pid, 0)
+            elapsed = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+        with open(os.path.join(work, 'crawl.log')) as log:
+            output = log.read()
+        match = re.search(r'Total pages crawled: (\d+)', output)
+        if process.returncode or not match:
+            print(f"{name}: crawler failed (exit {process.returncode}), last output:\n{output[-2000:]}")
+            return None
+
+        latencies = []
+        for path in glob.glob(os.path.join(latency_dir, '*.bin')):
+            with open(path, 'rb') as f:
+                data = f.read()
+            latencies.extend(value for (value,) in struct.iter_unpack('d', data))
+        latencies.sort()
+
+        pages = int(match.group(1))
+        cpu = usage.ru_utime + usage.ru_stime
+        return {
+            'mode': name,
+            'pages': pages,
+            'seconds': elapsed,
+            'pages_per_sec': pages / elapsed,
+            'p50_ms': 1000 * percentile(latencies, 0.50),
+            'p99_ms': 1000 * percentile(latencies, 0.99),
+            'cpu_ms_per_page': 1000 * cpu / pages if pages else float('nan'),
+            # ru_maxrss is in kilobytes on Linux, and the largest of the
+            # process and its shards rather than their total
+            'max_process_rss_mb': usage.ru_maxrss / 1024,
+        }
+
+
+def start_site(args):
+    command = [sys.executable, STUB_SITE, '--port', str(args.port), '--pages', str(args.site_pages),
+               '--latency-ms', str(args.latency_ms), '--error-rate', str(args.error_rate),
+               '--redirect-rate', str(args.redirect_rate)]
+    site = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    site.stdout.readline()  # "Serving ..." once the socket is bound
+    return site
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline crawler and SERP parsing benchmarks")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--pages', type=int, default=1000, help="pages crawled per mode")
+    parser.add_argument('--site-pages', type=int, default=20000, help="size of the synthetic site")
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--redirect-rate', type=float, default=0.02)
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--serps', type=int, default=200, help="SERP fixtures for the parse benchmark")
+    parser.add_argument('--skip-serps', action='store_true')
+    parser.add_argument('--child', metavar='LATENCY_DIR', help=argparse.SUPPRESS)
+    args, crawler_args = parser.parse_known_args()
+
+    if args.child:
+        run_child(args.child, [arg for arg in crawler_args if arg != '--'])
+        return
+
+    site = start_site(args)
+    try:
+        seed_url = f'http://127.0.0.1:{args.port}/p/0'
+        print(f"Crawling {args.pages} pages per mode from a {args.site_pages}-page synthetic site "
+              f"({args.latency_ms:.0f} ms mean latency, {args.error_rate:.0%} errors, "
+              f"{args.redirect_rate:.0%} redirects)")
+        print(f"{'mode':<14} {'pages':>6} {'pages/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'CPU ms/page':>12} {'RSS MB/proc':>12}")
+        for name in args.modes:
+            result = run_mode(name, seed_url, args.pages, MODES[name])
+            if result:
+                print(f"{name:<14} {result['pages']:>6} {result['pages_per_sec']:>8.1f} {result['p50_ms']:>8.1f} "
+                      f"{result['p99_ms']:>8.1f} {result['cpu_ms_per_page']:>12.2f} {result['max_process_rss_mb']:>12.1f}",
+                      flush=True)
+    finally:
+        site.terminate()
+        site.wait()
+
+    if not args.skip_serps:
+        with tempfile.TemporaryDirectory(prefix='bench-serps-') as fixtures:
+            subprocess.run([sys.executable, STUB_SITE, '--write-serps', fixtures, '--serps', str(args.serps)],
+                           check=True, stdout=subprocess.DEVNULL)
+            print()
+            subprocess.run([sys.executable, BENCH_SERP, '--pages', fixtures], cwd=os.path.dirname(BENCH_SERP))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VISIT_CSV = os.path.join(HERE, '..', 'assignment2', 'visit_latimes.csv')
+
+
+def load_sizes(visit_csv=VISIT_CSV):
+    # HTML page sizes from a real crawl; a lognormal stand-in if there is none
+    try:
+        with open(visit_csv, encoding='utf-8') as f:
+            sizes = sorted(int(row['Size']) for row in csv.DictReader(f) if 'text/html' in row['ContentType'])
+    except (OSError, KeyError, ValueError):
+        sizes = []
+    if not sizes:
+        rng = random.Random(0)
+        sizes = sorted(int(rng.lognormvariate(12.5, 0.9)) for _ in range(10000))
+    return sizes
+
+
+# A deterministic synthetic website. Page n always has the same size, links,
+# status and latency, so every crawler mode sees exactly the same site:
+#   /p/<n>        HTML page linking to other pages (popular pages get more links)
+#   /f/<n>.pdf    a file, served with Content-Length
+#   /html/?q=...  a DuckDuckGo-style result page, for SearchEngine
+class SyntheticSite:
+    def __init__(self, pages=10000, out_links=(20, 200), sizes=None, latency_ms=20.0, error_rate=0.02,
+                 redirect_rate=0.02, file_rate=0.02, max_size=2 * 2 ** 20, seed=0):
+        self.pages = pages
+        self.out_links = out_links
+        self.sizes = sizes or load_sizes()
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.redirect_rate = redirect_rate
+        self.file_rate = file_rate
+        self.max_size = max_size
+        self.seed = seed
+        self.filler = (b'<p>' + b'lorem ipsum dolor sit amet ' * 40 + b'</p>\n') * (max_size // 1000 + 1)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def rng(self, kind, n):
+        return random.Random(f'{self.seed}:{kind}:{n}')
+
+    def page_size(self, rng):
+        return min(self.sizes[int(rng.random() * len(self.sizes))], self.max_size)
+
+    def delay(self, rng):
+        # Lognormal, like real response times: mostly near the mean, a long tail
+        return self.latency * rng.lognormvariate(0, 0.5) if self.latency else 0
+
+    def link(self, rng):
+        if rng.random() < self.file_rate:
+            return f'/f/{rng.randrange(self.pages)}.pdf'
+        # Squaring skews links towards low page numbers, giving a few hub pages
+        return f'/p/{int(self.pages * rng.random() ** 2)}'
+
+    def page(self, n):
+        # Returns (status, headers, body, seconds to wait before answering)
+        rng = self.rng('page', n)
+        delay = self.delay(rng)
+        roll = rng.random()
+        if n >= self.pages:
+            return 404, {}, b'', delay
+        if n and roll < self.error_rate:
+            return rng.choice([404, 500, 503]), {}, b'', delay
+        if n and roll < self.error_rate + self.redirect_rate:
+            return 301, {'Location': f'/p/{rng.randrange(self.pages)}'}, b'', delay
+
+        links = ''.join(f'<a href="{self.link(rng)}">link</a>\n'
+                        for _ in range(rng.randint(*self.out_links)))
+        head = f'<!DOCTYPE html><html><head><title>Page {n}</title></head><body>\n{links}'.encode()
+        tail = b'</body></html>'
+        size = max(self.page_size(rng), len(head) + len(tail))
+        body = head + self.filler[:size - len(head) - len(tail)] + tail
+        return 200, {'Content-Type': 'text/html; charset=utf-8'}, body, delay
+
+    def file(self, n):
+        rng = self.rng('file', n)
+        return 200, {'Content-Type': 'application/pdf'}, b'%PDF' + bytes(self.page_size(rng)), self.delay(rng)
+
+    def serp(self, query):
+        rng = self.rng('serp', query)
+        return 200, {'Content-Type': 'text/html; charset=utf-8'}, serp_page(query, rng).encode(), self.delay(rng)
+
+    def respond(self, path):
+        with self.lock:
+            self.requests += 1
+        parsed = urlparse(path)
+        parts = parsed.path.strip('/').split('/')
+        try:
+            if parts[0] == 'p':
+                return self.page(int(parts[1]))
+            if parts[0] == 'f':
+                return self.file(int(parts[1].split('.')[0]))
+            if parts[0] == 'html':
+                return self.serp(parse_qs(parsed.query).get('q', [''])[0])
+            if parsed.path == '/':
+                return self.page(0)
+        except (IndexError, ValueError):
+            pass
+        return 404, {}, b'', 0
+
+
+def serp_page(query, rng, results=30):
+    # A result page laid out like html.duckduckgo.com: an ad, then result
+    # blocks whose title links go through the /l/?uddg= redirector
+    slug = quote('-'.join(query.lower().split())[:40])
+    blocks = []
+    for i in range(results):
+        url = f'https://site{rng.randrange(500)}.example.org/{slug}/{i}'
+        href = f'//duckduckgo.com/l/?uddg={quote(url, safe="")}&rut={rng.getrandbits(64):x}'
+        blocks.append(
+            '<div class="result results_links results_links_deep web-result ">'
+            '<div class="links_main links_deep result__body">'
+            f'<h2 class="result__title"><a rel="nofollow" class="result__a" href="{href}">Result {i}</a></h2>'
+            f'<a class="result__snippet" href="{href}">A snippet about <b>{query}</b></a>'
+            '<div class="result__extras"><div class="result__extras__url">'
+            f'<a class="result__url" href="{href}">{url}</a></div></div></div></div>\n')
+    ad = ('<div class="result--ad"><div class="result__body">'
+          '<a class="result__a" href="https://ads.example.com/click">Ad</a></div></div>')
+    return (f'<!DOCTYPE html><html><head><title>{query} at DuckDuckGo</title></head><body>'
+            f'<form><input name="q" value="{query}"></form>{ad}'
+            f'<div id="links" class="results">{"".join(blocks)}</div></body></html>')
+
+
+def write_serp_fixtures(out_dir, count, seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    for i in range(count):
+        query = f'synthetic query number {i}'
+        with open(os.path.join(out_dir, f'serp{i:05d}.html'), 'w', encoding='utf-8') as f:
+            f.write(serp_page(query, random.Random(f'{seed}:serp:{query}')))
+
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, as on a real site
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            status, headers, body, delay = site.respond(self.path)
+            if delay:
+                time.sleep(delay)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 overflows under the async mode's hundreds of
+    # connections, and SYN retransmits then dominate the measured latency
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Crawlers hang up mid-response all the time (size caps, shutdown)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(site, port):
+    return StubServer(('127.0.0.1', port), make_handler(site))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic website for offline crawler benchmarks")
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="mean injected response time")
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--redirect-rate', type=float, default=0.02)
+    parser.add_argument('--file-rate', type=float, default=0.02, help="share of links pointing at PDF files")
+    parser.add_argument('--max-size', type=int, default=2 * 2 ** 20, help="cap on sampled page sizes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--write-serps', metavar='DIR', help="write SERP fixtures to DIR instead of serving")
+    parser.add_argument('--serps', type=int, default=100, help="number of SERP fixtures to write")
+    args = parser.parse_args()
+
+    if args.write_serps:
+        write_serp_fixtures(args.write_serps, args.serps, args.seed)
+        print(f"Wrote {args.serps} result pages to {args.write_serps}")
+    else:
+        site = SyntheticSite(args.pages, latency_ms=args.latency_ms, error_rate=args.error_rate,
+                             redirect_rate=args.redirect_rate, file_rate=args.file_rate,
+                             max_size=args.max_size, seed=args.seed)
+        print(f"Serving {args.pages} synthetic pages on http://127.0.0.1:{args.port}/", flush=True)
+        serve(site, args.port).serve_forever()
@@ -0,0 +1,99 @@
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src', 'spm',
+})
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+# One canonical spelling per URL, shared by the crawler (dedup before
+# fetching) and the evaluator (matching engine results against Google):
+# lowercase scheme and host, no default port, no fragment, no tracking
+# parameters, parameters sorted by name. Stripping "www." and trailing
+# slashes is optional, because a crawler still has to fetch the result.
+#
+# Results are memoized in a bounded LRU cache; the same links turn up on
+# page after page, and the same Google URLs in query after query.
+class UrlCanonicalizer:
+    def __init__(self, maxsize=1 << 16, include_scheme=True, strip_www=True, strip_trailing_slash=True,
+                 sort_query=True, drop_tracking=True):
+        # include_scheme=False gives the evaluator's "host/path?query" keys, so
+        # http and https results still match
+        self.include_scheme = include_scheme
+        self.strip_www = strip_www
+        self.strip_trailing_slash = strip_trailing_slash
+        self.sort_query = sort_query
+        self.drop_tracking = drop_tracking
+        self.canonicalize = lru_cache(maxsize=maxsize)(self.compute)
+
+    def compute(self, url):
+        url = url.strip()
+        if '://' not in url and not url.startswith('/'):
+            # "example.com/path", as stored in earlier results; a bare
+            # "mailto:..." or "tel:..." is left for urlsplit to read as a scheme
+            head = url.split('/', 1)[0]
+            if ':' not in head or head.rsplit(':', 1)[1].isdigit() or head.startswith('['):
+                url = '//' + url
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ('', 'http', 'https'):
+            return url
+
+        host = parts.hostname or ''
+        if self.strip_www and host.startswith('www.'):
+            host = host[4:]
+        if ':' in host:
+            # IPv6 literal; hostname drops the brackets the URL needs
+            host = f'[{host}]'
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port is not None and DEFAULT_PORTS.get(scheme) != port:
+            host = f'{host}:{port}'
+        userinfo = parts.netloc.rpartition('@')[0]
+        if userinfo:
+            # Picks the account to fetch as, so it stays, as written
+            host = f'{userinfo}@{host}'
+
+        path = parts.path
+        if self.strip_trailing_slash:
+            path = path.rstrip('/')
+        if self.include_scheme and not path:
+            path = '/'
+
+        params = [param for param in parts.query.split('&') if param]
+        if self.drop_tracking:
+            params = [param for param in params if not is_tracking_param(param.split('=', 1)[0])]
+        if self.sort_query:
+            # Stable, so repeated parameters keep their relative order
+            params.sort(key=lambda param: param.split('=', 1)[0])
+
+        canonical = f'{scheme}://{host}{path}' if self.include_scheme and scheme else f'{host}{path}'
+        if params:
+            canonical += '?' + '&'.join(params)
+        return canonical
+
+    def canonicalize_many(self, urls):
+        canonicalize = self.canonicalize
+        return [canonicalize(url) for url in urls]
+
+    def stats(self):
+        info = self.canonicalize.cache_info()
+        lookups = info.hits + info.misses
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+                'hit_rate': info.hits / lookups if lookups else 0.0}
+
+    def clear(self):
+        self.canonicalize.cache_clear()